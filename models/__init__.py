@@ -15,6 +15,11 @@ class AIRequest(BaseModel):
     max_tokens: Optional[int] = 500
     include_explanation: Optional[bool] = True
     style: Optional[str] = "default"
+    session_id: Optional[str] = None  # reuse Ollama's context across this client's requests
+    deadline_seconds: Optional[float] = None  # answer from the examples if CodeLlama takes longer (0 = wait)
+
+class JobRequest(AIRequest):
+    callback_url: Optional[str] = None  # POSTed the finished job, if webhooks are enabled
 
 class AIResponse(BaseModel):
     code: str
@@ -24,6 +29,10 @@ class AIResponse(BaseModel):
     related_snippets: Optional[List[str]] = None
     message: Optional[str] = None
     learned_from: Optional[str] = None
+    source: Optional[str] = None
+    examples_used: Optional[List[str]] = None
+    model_info: Optional[str] = None
+    upgrade_job_id: Optional[str] = None  # set when CodeLlama's answer will follow as a job
 
 class LearnRequest(BaseModel):
     prompt: str
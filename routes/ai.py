@@ -1,16 +1,49 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import AsyncIterator, Dict, Optional
+import asyncio
 import json
-import os
 try:
     import requests
 except ImportError:
     requests = None
-from models import AIRequest, AIResponse, AutocompleteRequest, AutocompleteResponse, SkriptCode, LearnRequest, FeedbackRequest
+from models import AIRequest, AIResponse, AutocompleteRequest, AutocompleteResponse, SkriptCode, LearnRequest, FeedbackRequest, JobRequest
 from services.ai_service import SkDuckyAIService
+from services.jobs import JobQueueFull
+from services.lazy import LazyService
 
 router = APIRouter(tags=["ai"])
-ai_service = SkDuckyAIService()
+ai_service = LazyService(SkDuckyAIService)  # built on first use, not at import
+init_task: Optional[asyncio.Task] = None
+
+@router.on_event("startup")
+async def start_background_init():
+    """Load the service and check/pull the Ollama model in the background, so the app accepts requests right away"""
+    global init_task
+    init_task = asyncio.ensure_future(_initialize_service())
+
+async def _initialize_service():
+    try:
+        service = await asyncio.to_thread(ai_service.get)
+        await service.start_ollama()
+    except Exception as e:
+        print(f"❌ Background initialization failed: {e}")
+
+@router.on_event("shutdown")
+async def flush_pending_writes():
+    """Write buffered usage counters and close Ollama connections before the worker exits"""
+    if init_task is not None and not init_task.done():
+        init_task.cancel()
+    if ai_service.loaded:
+        ai_service.flush_usage_counts()
+        await ai_service.close()
+
+@router.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once the examples are loaded (Ollama may still be starting), 503 before"""
+    if not ai_service.loaded:
+        return JSONResponse(status_code=503, content={"ready": False, "service": "loading"})
+    return {"ready": True, "service": "ready", **ai_service.get_readiness()}
 
 @router.get("/test")
 async def test_endpoint():
@@ -20,11 +53,29 @@ async def test_endpoint():
 @router.post("/generate", response_model=AIResponse)
 async def generate_code(request: AIRequest):
     try:
-        response = ai_service.generate_code(request)
+        response = await ai_service.generate_code(request)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate/stream")
+async def generate_code_stream(request: AIRequest, stream_format: str = Query("ndjson", alias="format")):
+    """Hybrid generation streamed as NDJSON (default) or Server-Sent Events (?format=sse)"""
+    return _stream_events(ai_service.stream_generation(request, hybrid=True), stream_format)
+
+def _stream_events(events: AsyncIterator[Dict], stream_format: str) -> StreamingResponse:
+    """Encode generation events as NDJSON lines or SSE messages"""
+    if stream_format == "sse":
+        async def encode():
+            async for event in events:
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        return StreamingResponse(encode(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    
+    async def encode():
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    return StreamingResponse(encode(), media_type="application/x-ndjson")
+
 @router.post("/learn")
 async def learn_example(request: LearnRequest):
     """Teach a new example to the AI"""
@@ -39,11 +90,6 @@ async def get_examples():
     """Get all learned examples"""
     return []  # Return empty array for now to test
 
-@router.get("/ollama/status")
-async def ollama_status_simple():
-    """Simple Ollama status check"""
-    return {"available": True, "message": "Testing"}
-
 @router.get("/ollama/diagnose")
 async def ollama_diagnose_simple():
     """Simple Ollama diagnosis"""
@@ -135,7 +181,7 @@ async def generate_with_ollama(request: AIRequest):
         if not ai_service.ollama_enabled:
             raise HTTPException(status_code=503, detail="Ollama service is not available")
         
-        result = ai_service.generate_with_ollama(request.prompt, request.include_explanation)
+        result = await ai_service.generate_with_ollama(request.prompt, request.include_explanation, request.session_id)
         
         if result.get("error"):
             raise HTTPException(status_code=500, detail=result["message"])
@@ -144,6 +190,11 @@ async def generate_with_ollama(request: AIRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate-ollama/stream")
+async def generate_with_ollama_stream(request: AIRequest, stream_format: str = Query("ndjson", alias="format")):
+    """Ollama-only generation streamed as NDJSON (default) or Server-Sent Events (?format=sse)"""
+    return _stream_events(ai_service.stream_generation(request, hybrid=False), stream_format)
+
 @router.get("/ollama/status")
 async def get_ollama_status():
     """Get Ollama service status"""
@@ -153,11 +204,35 @@ async def get_ollama_status():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/jobs", status_code=202)
+async def create_job(request: JobRequest):
+    """Queue a generation and return its job id right away; poll GET /jobs/{id} (or pass callback_url) for the result"""
+    if request.callback_url and not ai_service.allow_job_webhooks:
+        raise HTTPException(status_code=400, detail="Webhooks are disabled (set SKDUCKY_JOB_WEBHOOKS=true)")
+    try:
+        job = ai_service.submit_generation_job(request)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many queued jobs: {e}")
+    return {"id": job.id, "status": job.status, "status_url": f"/api/v1/ai/jobs/{job.id}"}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and result of a background generation: a POSTed job, or the CodeLlama upgrade of a speculative answer"""
+    job = ai_service.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict()
+
+@router.get("/ollama/queue")
+async def get_ollama_queue():
+    """Current generation queue: running and waiting generations and the expected wait for a new one"""
+    return ai_service.generation_scheduler.status()
+
 @router.get("/ollama/models")
 async def get_ollama_models():
     """Get available Ollama models"""
     try:
-        models = ai_service.get_ollama_models()
+        models = await ai_service.get_ollama_models()
         return {"models": models}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -204,54 +279,7 @@ async def submit_codellama_feedback(request: dict):
 async def get_learning_stats():
     """Get comprehensive learning statistics for both traditional AI and Ollama"""
     try:
-        stats = {
-            "traditional_ai": {
-                "total_examples": len(ai_service.examples),
-                "user_corrections": len([ex for ex in ai_service.examples if ex.get("source") == "user_correction"]),
-                "knowledge_patterns": len(ai_service.knowledge.get("patterns", {})),
-                "best_practices": len(ai_service.knowledge.get("best_practices", []))
-            },
-            "ollama_ai": {
-                "enabled": ai_service.ollama_enabled,
-                "current_model": ai_service.ollama_model,
-                "learning_examples": 0,
-                "positive_feedback": 0,
-                "corrections": 0,
-                "negative_feedback": 0
-            },
-            "feedback_data": {
-                "total_feedback": 0,
-                "positive": 0,
-                "negative": 0,
-                "corrections": 0
-            }
-        }
-        
-        # Count Ollama learning examples
-        try:
-            if os.path.exists("ollama_learning_context.json"):
-                with open("ollama_learning_context.json", "r", encoding="utf-8") as f:
-                    ollama_data = json.load(f)
-                    stats["ollama_ai"]["learning_examples"] = len(ollama_data)
-                    stats["ollama_ai"]["positive_feedback"] = len([ex for ex in ollama_data if ex.get("type") == "positive_feedback"])
-                    stats["ollama_ai"]["corrections"] = len([ex for ex in ollama_data if ex.get("type") == "correction_training"])
-                    stats["ollama_ai"]["negative_feedback"] = len([ex for ex in ollama_data if ex.get("type") == "negative_feedback"])
-        except Exception:
-            pass
-        
-        # Count feedback data
-        try:
-            if os.path.exists("feedback_data.json"):
-                with open("feedback_data.json", "r", encoding="utf-8") as f:
-                    feedback_data = json.load(f)
-                    stats["feedback_data"]["total_feedback"] = len(feedback_data)
-                    stats["feedback_data"]["positive"] = len([fb for fb in feedback_data if fb.get("feedback_type") == "correct"])
-                    stats["feedback_data"]["negative"] = len([fb for fb in feedback_data if fb.get("feedback_type") == "incorrect"])
-                    stats["feedback_data"]["corrections"] = len([fb for fb in feedback_data if fb.get("corrected_code")])
-        except Exception:
-            pass
-        
-        return stats
+        return ai_service.get_learning_stats()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -259,31 +287,7 @@ async def get_learning_stats():
 async def get_learning_context():
     """Get recent learning context for debugging and insights"""
     try:
-        context = {}
-        
-        # Get recent Ollama learning examples
-        try:
-            if os.path.exists("ollama_learning_context.json"):
-                with open("ollama_learning_context.json", "r", encoding="utf-8") as f:
-                    ollama_data = json.load(f)
-                    context["recent_ollama_learning"] = ollama_data[-5:]  # Last 5 examples
-        except Exception:
-            context["recent_ollama_learning"] = []
-        
-        # Get recent feedback
-        try:
-            if os.path.exists("feedback_data.json"):
-                with open("feedback_data.json", "r", encoding="utf-8") as f:
-                    feedback_data = json.load(f)
-                    context["recent_feedback"] = feedback_data[-5:]  # Last 5 feedback entries
-        except Exception:
-            context["recent_feedback"] = []
-        
-        # Get recent user corrections
-        recent_corrections = [ex for ex in ai_service.examples if ex.get("source") == "user_correction"][-5:]
-        context["recent_corrections"] = recent_corrections
-        
-        return context
+        return ai_service.get_learning_context()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,27 +1,136 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+import asyncio
+import atexit
+import httpx
 import json
 import os
-import re
-import requests
+import time
 from datetime import datetime
 import sys
 from pathlib import Path
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Add parent directory to sys.path to find models
 parent_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(parent_dir))
 
 # Import models from the centralized models module
-from models import AIRequest, AIResponse, LearnRequest
+from models import AIRequest, AIResponse, JobRequest
+from services.cache import GenerationCache, SingleFlight, cache_key, normalize_prompt
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.concepts import ConceptExtractor
+from services.error_patterns import ErrorPatternIndex, line_similarity, normalized_lines
+from services.jobs import Job, JobStore, JobWorkers
+from services.ollama_client import OllamaClient
+from services.similarity import LSHIndex, MinHasher
+from services.stats import LearningStats, RecentActivity
+from services.streaming import IncrementalCodeCleaner
+from services.storage import WriteBehindCounter, open_storage
+from services.scheduler import GenerationQueueFull, GenerationScheduler
+from services.warmup import ModelWarmth, parse_keep_alive
+from services.prompt_budget import PromptBudget, PromptPiece, prompt_overlap
+from services.retrieval import BM25Ranker, ExampleIndex, ExampleMatrix, tokenize, top_k_indices
+
+# Bump when _extract_concepts/_analyze_code_structure change so stored features get recomputed
+# (concept lexicon edits are picked up through the lexicon fingerprint)
+EXAMPLE_FEATURES_VERSION = 3
+
+EXAMPLES_CONTEXT_FOOTER = """LEARN FROM THESE PATTERNS:
+- Notice syntax structure and indentation
+- Copy command/event formats that work
+- Use similar variable names and logic flow
+- Maintain consistent Skript syntax"""
+FEEDBACK_CONTEXT_HEADER = "# IMPORTANT LEARNING FROM FEEDBACK:"
+
+# Fixed instructions that open every prompt. Keeping them byte-identical and first lets
+# Ollama reuse their cached evaluation; everything request-specific comes after them.
+HYBRID_PROMPT_PREFIX = """You are SkDucky 🦆, an expert Skript developer duck! You learn from examples and create better code.
+
+🦆 DUCKY'S HYBRID APPROACH:
+1. ANALYZE the relevant examples I found for this request
+2. LEARN from their syntax, patterns, and structure  
+3. GENERATE improved code using that knowledge
+4. EXPLAIN what you learned from the examples
+
+🏗️ SKRIPT SYNTAX RULES:
+- Use proper indentation (4 spaces)
+- Commands: 'command /name:' with 'trigger:' block
+- Events: 'on event:' format
+- Messages: 'send "text" to player'
+- Items: 'give X Y to player'
+
+📝 INSTRUCTIONS:
+- Use the examples' syntax patterns and structure
+- Improve upon them if possible
+- Explain what you learned from each example
+- Generate clean, working Skript code"""
+
+OLLAMA_PROMPT_PREFIX = """You are SkDucky 🦆, an expert Skript developer duck! You're helpful, friendly, and love clean code.
+
+🦆 DUCKY'S SKRIPT RULES:
+- Use proper indentation (4 spaces) - ducks like organized nests!
+- Always end event/command lines with colons
+- Use 'give X Y to player' for items
+- Use 'send "message" to player' for messages
+- Commands start with 'command /name:'
+- Events start with 'on event:'
+
+🏗️ DUCKY'S CODE STRUCTURE (in this order):
+1. Options (if needed)
+2. Commands 
+3. Events
+4. Functions (PRIORITIZE functions for complex logic!)
+
+📋 FUNCTION PRIORITY RULE:
+- If the logic is more than 3-4 lines, CREATE A FUNCTION!
+- Keep events clean by calling functions
+- Example: Instead of long code in "on join:", create a "welcomePlayer()" function"""
 
 # --- SERVICE ---
 
 class SkDuckyAIService:
     def __init__(self, training_path: str = "training_data.json", knowledge_path: str = "knowledge_base.json"):
         self.examples: List[Dict[str, str]] = []
+        self.example_index = ExampleIndex()  # token -> example ids, kept in sync with self.examples
+        self.ranker = BM25Ranker(self.example_index)
+        
+        # Vectorized (NumPy) scoring for large example stores: "auto", "on" or "off"
+        self.example_matrix = ExampleMatrix(self.ranker) if np is not None else None
+        self.vector_scoring = os.environ.get("SKDUCKY_VECTOR_SCORING", "auto").lower()
+        self.vector_scoring_min_examples = int(os.environ.get("SKDUCKY_VECTOR_MIN_EXAMPLES", "2000"))
         self.training_path = training_path
         self.knowledge_path = knowledge_path
+        self.minhasher = MinHasher()
+        self.error_pattern_index = ErrorPatternIndex(minhasher=self.minhasher)  # loaded once, rebuilt on every write
+        self.example_lsh = LSHIndex()  # MinHash buckets over example code, for near-duplicate lookups
+        self.near_duplicate_threshold = 0.9
+        
+        # Examples, feedback and learning history: JSON files (default) or SQLite in WAL mode
+        self.storage = open_storage(
+            os.environ.get("SKDUCKY_STORAGE", "json").lower(),
+            training_path,
+            sqlite_path=os.environ.get("SKDUCKY_SQLITE_PATH", "skducky.db")
+        )
+        # With shared storage, examples and error patterns other workers stored are picked up this often
+        self.storage_sync_seconds = float(os.environ.get("SKDUCKY_STORAGE_SYNC_SECONDS", "5"))
+        self.storage_synced_at = time.monotonic()
+        
+        # Usage counters are bumped in memory and written behind, off the request path
+        self.usage_counter = WriteBehindCounter(
+            self._write_usage_counts,
+            flush_interval=float(os.environ.get("SKDUCKY_USAGE_FLUSH_SECONDS", "30")),
+            max_pending=int(os.environ.get("SKDUCKY_USAGE_FLUSH_THRESHOLD", "50"))
+        )
+        atexit.register(self.flush_usage_counts)
+        
+        # Counters for /learning/stats, kept up to date on every write
+        self.ollama_context_limit = 100  # newest Ollama learning entries kept
+        self.learning_stats = LearningStats(self.ollama_context_limit)
+        self.recent_activity = RecentActivity(size=5)  # newest entries for /learning/context
         self.learning_enabled = True
         
         # Ollama configuration - now ENABLED for production with CodeLlama!
@@ -33,18 +142,82 @@ class SkDuckyAIService:
             self.ollama_base_url = ollama_url
         
         self.ollama_model = "codellama"
-        self.ollama_enabled = os.environ.get("OLLAMA_ENABLED", "false").lower() == "true"
+        self.ollama_configured = os.environ.get("OLLAMA_ENABLED", "false").lower() == "true"
+        self.ollama_enabled = False  # set by the background check in start_ollama() once the model is there
+        self.ollama_state = "starting" if self.ollama_configured else "disabled"
+        self.ollama_pull_progress: Optional[Dict] = None
+        # Context window shared by the prompt and the answer; prompts are packed to fit it
+        self.ollama_num_ctx = int(os.environ.get("OLLAMA_NUM_CTX", "2048"))
+        self.hybrid_options = {
+            "temperature": 0.3,  # Lower for more consistent code
+            "top_p": 0.9,
+            "top_k": 50,
+            "num_predict": 300,
+            "num_ctx": self.ollama_num_ctx
+        }
+        self.ollama_options = {
+            "temperature": 0.2,  # Lower temperature for faster, more consistent code
+            "top_p": 0.8,
+            "num_predict": 300,  # Limit output length for faster response
+            "num_ctx": self.ollama_num_ctx,
+            "repeat_penalty": 1.1
+        }
         
-        # Check Ollama availability at startup
-        if self.ollama_enabled:
-            print(f"🦆 Checking Ollama availability at {self.ollama_base_url}...")
-            self._check_ollama_availability()
-            if self.ollama_enabled:
-                print(f"✅ Ollama connected! Using {self.ollama_model}")
-            else:
-                print("❌ Ollama not available, using examples only")
-        else:
-            print("🦆 Ollama disabled by configuration")
+        # Keep the model loaded between requests (duration like "30m", seconds, or -1 for forever)
+        self.ollama_keep_alive = parse_keep_alive(os.environ.get("OLLAMA_KEEP_ALIVE", "30m"))
+        self.model_warmth = ModelWarmth(self.ollama_keep_alive)
+        self.ollama_timeout = float(os.environ.get("OLLAMA_TIMEOUT", "15"))
+        self.ollama_cold_timeout = float(os.environ.get("OLLAMA_COLD_TIMEOUT", "120"))  # when the model has to load first
+        self._warmup_tasks: Dict[str, asyncio.Task] = {}
+        
+        # Hybrid answers, keyed by prompt + context examples + model + options (SKDUCKY_CACHE_SIZE=0 disables)
+        self.generation_cache = GenerationCache(
+            max_entries=int(os.environ.get("SKDUCKY_CACHE_SIZE", "256")),
+            ttl_seconds=float(os.environ.get("SKDUCKY_CACHE_TTL_SECONDS", "3600"))
+        )
+        self.inflight_generations = SingleFlight()  # identical concurrent generations share one Ollama call
+        
+        # Speculative mode: answer from the examples if Ollama isn't done by the deadline (0 = always wait)
+        self.ollama_deadline = float(os.environ.get("SKDUCKY_OLLAMA_DEADLINE", "0"))
+        self.jobs = JobStore(ttl_seconds=float(os.environ.get("SKDUCKY_JOB_TTL_SECONDS", "600")))
+        
+        # Generation jobs (POST /jobs): a few in-process workers, results kept in self.jobs
+        self.job_workers = JobWorkers(
+            self.jobs,
+            self._run_generation_job,
+            workers=int(os.environ.get("SKDUCKY_JOB_WORKERS", "2")),
+            max_pending=int(os.environ.get("SKDUCKY_JOB_QUEUE", "100")),
+            on_finished=self._notify_job_webhook,
+            notify_timeout=float(os.environ.get("SKDUCKY_JOB_WEBHOOK_TIMEOUT", "5"))
+        )
+        self.allow_job_webhooks = os.environ.get("SKDUCKY_JOB_WEBHOOKS", "false").lower() == "true"
+        
+        # Ollama context tokens per client session (AIRequest.session_id): (model, tokens), newest sessions kept
+        self.session_contexts = GenerationCache(
+            max_entries=int(os.environ.get("OLLAMA_MAX_SESSIONS", "256")),
+            ttl_seconds=float(os.environ.get("OLLAMA_SESSION_TTL_SECONDS", "1800"))
+        )
+        
+        # Admission control: a CPU-bound Ollama can only do so many generations at once
+        self.generation_scheduler = GenerationScheduler(
+            max_concurrency=int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "1")),
+            max_queue=int(os.environ.get("OLLAMA_MAX_QUEUE", "8")),
+            max_wait_seconds=float(os.environ.get("OLLAMA_MAX_QUEUE_WAIT", "15"))
+        )
+        
+        # Pooled async client; availability is checked by start_ollama() once the event loop runs
+        self.ollama_client = OllamaClient(
+            self.ollama_base_url,
+            max_connections=int(os.environ.get("OLLAMA_MAX_CONNECTIONS", "10"))
+        )
+        
+        # Stop calling a failing Ollama for a while; background probes decide when to try again
+        self.ollama_breaker = CircuitBreaker(
+            failure_threshold=int(os.environ.get("OLLAMA_BREAKER_FAILURES", "3")),
+            reset_timeout=float(os.environ.get("OLLAMA_BREAKER_RESET_SECONDS", "30"))
+        )
+        self.ollama_health = {"models": [], "checked_at": None}  # last known /api/tags result, served by status
+        self._probe_task: Optional[asyncio.Task] = None
         
         # Inicializar knowledge base
         self.knowledge = {
@@ -52,10 +225,13 @@ class SkDuckyAIService:
             "best_practices": [],
             "common_errors": []
         }
+        self.concepts = ConceptExtractor()
         
-        self.load_examples()
+        # Knowledge first: its concept lexicon is needed to compute example features
         self.load_knowledge_base()
-        self._check_ollama_availability()
+        self.load_examples()
+        self.load_error_patterns()
+        self._load_learning_stats()
 
     def learn(self, prompt: str, code: str):
         """Learn a new example with timestamp and duck charm"""
@@ -73,38 +249,128 @@ class SkDuckyAIService:
             "usage_count": 0
         }
         
+        # Flag examples whose code is nearly identical to one we already know
+        duplicate = self._find_near_duplicate(example)
+        if duplicate is not None:
+            example["near_duplicate_of"] = duplicate["prompt"]
+        
         self.examples.append(example)
-        self.save_examples()
+        self._index_example(len(self.examples) - 1)
+        self._persist_new_example(len(self.examples) - 1)
+        self.learning_stats.record_example(example)
+        self.recent_activity.record_example(example)
+        
+        if duplicate is not None:
+            return f"🦆 Quack quack! I learned a new trick: '{prompt}' 📚✨ (its code looks almost the same as '{duplicate['prompt']}')"
         return f"🦆 Quack quack! I learned a new trick: '{prompt}' 📚✨"
 
-    def generate_code(self, request: AIRequest) -> AIResponse:
+    async def generate_code(self, request: AIRequest) -> AIResponse:
         """Generate code using hybrid system: Ollama + Examples + Knowledge Base"""
         prompt = request.prompt.strip().lower()
+        self._sync_storage()
 
         # 🦆 HYBRID SYSTEM: If Ollama is available, use it WITH examples context
-        if self.ollama_enabled:
+        if self._ollama_ready():
             # Find relevant examples first to give context to Ollama
-            relevant_examples = self._find_relevant_examples(prompt)
-            
-            # Generate with Ollama using examples as context
-            ollama_result = self.generate_with_ollama_hybrid(
-                request.prompt, 
-                relevant_examples,
-                request.include_explanation if hasattr(request, 'include_explanation') else False
+            ranked = self._rank_example_ids(prompt, 5, by_usage=True)
+            relevant_examples = self._find_relevant_examples(prompt, ranked)
+            
+            # Same prompt, same context examples, same model and options (and the same session
+            # context, which also shapes the answer): reuse the earlier answer
+            include_explanation = bool(getattr(request, 'include_explanation', False))
+            key = cache_key(prompt, [example_id for example_id, _ in ranked], self.ollama_model,
+                            self.hybrid_options, include_explanation, self._session_cache_key(request.session_id))
+            cached = self.generation_cache.get(key)
+            if cached is not None:
+                return cached.model_copy(deep=True)
+            
+            # Generate with Ollama using examples as context (joining an identical generation already running)
+            ollama_call = self.inflight_generations.run(
+                key,
+                lambda: self.generate_with_ollama_hybrid(request.prompt, relevant_examples, include_explanation,
+                                                         session_id=request.session_id)
             )
             
-            if ollama_result.get("code"):
-                return AIResponse(
-                    code=ollama_result["code"],
-                    explanation=ollama_result.get("explanation", "Generated with CodeLlama + learned examples"),
-                    confidence=0.9,  # High confidence for hybrid system
-                    source="hybrid_ollama_examples",
-                    examples_used=ollama_result.get("examples_used", []),
-                    model_info=f"CodeLlama + {len(relevant_examples)} examples",
-                    message=ollama_result.get("message", "🦆 Generated with AI + learned patterns!")
-                )
+            deadline = request.deadline_seconds if request.deadline_seconds is not None else self.ollama_deadline
+            if deadline > 0:
+                # Speculative: don't make the user wait past the deadline for CodeLlama
+                ollama_task = asyncio.ensure_future(ollama_call)
+                finished, _ = await asyncio.wait({ollama_task}, timeout=deadline)
+                if not finished:
+                    return self._speculative_response(request, ollama_task, relevant_examples, key, prompt)
+                ollama_result = ollama_task.result()
+            else:
+                ollama_result = await ollama_call
+            
+            response = self._hybrid_response(ollama_result, relevant_examples, key, prompt)
+            if response is not None:
+                return response
 
         # Fallback to traditional example-based system
+        return self.generate_from_examples(request)
+    
+    def submit_generation_job(self, request: JobRequest) -> Job:
+        """Queue a generation and return its job right away (raises JobQueueFull)"""
+        return self.job_workers.submit("generation", request)
+    
+    async def _run_generation_job(self, request: JobRequest) -> Dict:
+        # Nobody is waiting on a job's response, so a speculative example answer would only get in the way
+        response = await self.generate_code(request.model_copy(update={"deadline_seconds": 0}))
+        return response.model_dump()
+    
+    async def _notify_job_webhook(self, job: Job, request: JobRequest):
+        """POST the finished job to the request's callback_url, if it gave one"""
+        if not request.callback_url:
+            return
+        async with httpx.AsyncClient(timeout=self.job_workers.notify_timeout) as client:
+            response = await client.post(request.callback_url, json=job.to_dict())
+            if response.status_code >= 400:
+                print(f"⚠️ Webhook for job {job.id} returned {response.status_code}")
+    
+    def _hybrid_response(self, ollama_result: Dict, relevant_examples: List[Dict], key, prompt: str) -> Optional[AIResponse]:
+        """AIResponse for a hybrid generation result (cached when it came from Ollama); None if it has no code"""
+        if not ollama_result.get("code"):
+            return None
+        
+        response = AIResponse(
+            code=ollama_result["code"],
+            explanation=ollama_result.get("explanation", "Generated with CodeLlama + learned examples"),
+            confidence=0.9,  # High confidence for hybrid system
+            source="hybrid_ollama_examples",
+            examples_used=ollama_result.get("examples_used", []),
+            model_info=ollama_result.get("model_info", f"CodeLlama + {len(relevant_examples)} examples"),
+            message=ollama_result.get("message", "🦆 Generated with AI + learned patterns!")
+        )
+        # Only real Ollama answers are cached; example fallbacks are cheap and track usage counts
+        if ollama_result.get("source") == "hybrid_ollama_examples":
+            self.generation_cache.put(key, normalize_prompt(prompt), response.model_copy(deep=True))
+        return response
+    
+    def _speculative_response(self, request: AIRequest, ollama_task: "asyncio.Future", relevant_examples: List[Dict],
+                              key, prompt: str) -> AIResponse:
+        """The example engine's answer now, plus a job that collects CodeLlama's answer when it arrives.
+        
+        The examples are only consulted here, once the deadline has passed: they answer in
+        milliseconds, and usage counts stay limited to answers that are actually returned.
+        """
+        def upgrade(ollama_result: Dict) -> Optional[Dict]:
+            # Only an actual CodeLlama answer is an upgrade; a fallback would repeat the examples
+            if ollama_result.get("source") != "hybrid_ollama_examples":
+                return None
+            response = self._hybrid_response(ollama_result, relevant_examples, key, prompt)
+            return response.model_dump() if response is not None else None
+        
+        job = self.jobs.track("upgrade", ollama_task, upgrade)
+        response = self.generate_from_examples(request)
+        response.source = response.source or "examples"
+        response.upgrade_job_id = job.id
+        response.message = f"{response.message or ''}\n\n⏳ CodeLlama is still thinking - check /api/v1/ai/jobs/{job.id} for its answer!".strip()
+        return response
+
+    def generate_from_examples(self, request: AIRequest) -> AIResponse:
+        """Generate code from the knowledge base and learned examples only (no network calls)"""
+        prompt = request.prompt.strip().lower()
+        self._sync_storage()
 
         # First, try intelligent pattern matching using knowledge base
         intelligent_result = self._try_intelligent_generation(prompt)
@@ -122,33 +388,26 @@ class SkDuckyAIService:
             
             return intelligent_result
 
-        # Fallback to example matching
-        relevant = []
-        
-        for ex in self.examples:
-            score = self._calculate_relevance_score(prompt, ex["prompt"])
-            if score > 0:
-                relevant.append((ex, score))
-        
-        # Sort by relevance
-        relevant.sort(key=lambda x: x[1], reverse=True)
+        # Fallback to example matching: every example sharing a token, best BM25 score first
+        relevant = self._rank_all_example_ids(prompt)
 
         if relevant:
-            best_example, score = relevant[0]
+            best_id, score = relevant[0]
+            best_example = self.examples[best_id]
             
             # Check if this example was marked as incorrect before
             error_check = self._check_error_patterns(prompt, best_example["code"])
             if error_check and error_check["warning"]:
                 # Skip this example and try the next one
-                for alt_example, alt_score in relevant[1:]:
-                    alt_error_check = self._check_error_patterns(prompt, alt_example["code"])
+                for alt_id, alt_score in relevant[1:]:
+                    alt_error_check = self._check_error_patterns(prompt, self.examples[alt_id]["code"])
                     if not alt_error_check or not alt_error_check["warning"]:
-                        best_example, score = alt_example, alt_score
+                        best_id, best_example, score = alt_id, self.examples[alt_id], alt_score
                         break
             
             # Increment usage counter
             best_example["usage_count"] = best_example.get("usage_count", 0) + 1
-            self.save_examples()
+            self.usage_counter.mark(best_id)
             
             explanation = None
             if request.include_explanation:
@@ -225,31 +484,16 @@ class SkDuckyAIService:
         # Extract key concepts from the user prompt
         prompt_concepts = self._extract_concepts(prompt)
         
-        # Find examples with similar concepts
-        pattern_matches = []
-        for example in self.examples:
-            example_concepts = self._extract_concepts(example["prompt"])
-            
-            # Calculate concept similarity
-            concept_overlap = len(prompt_concepts.intersection(example_concepts))
-            if concept_overlap > 0:
-                # Analyze the structure of the example code
-                code_structure = self._analyze_code_structure(example["code"])
-                
-                pattern_matches.append({
-                    "example": example,
-                    "concepts": example_concepts,
-                    "overlap": concept_overlap,
-                    "structure": code_structure,
-                    "relevance": self._calculate_pattern_relevance(prompt_concepts, example_concepts, code_structure)
-                })
+        # Large stores: score every example in one pass over the feature matrices
+        if self._use_vector_scoring():
+            pattern_matches = self._vector_pattern_matches(prompt, prompt_concepts)
+        else:
+            pattern_matches = self._loop_pattern_matches(prompt, prompt_concepts)
         
         if not pattern_matches:
             return None
         
-        # Sort by relevance
-        pattern_matches.sort(key=lambda x: x["relevance"], reverse=True)
-        best_match = pattern_matches[0]
+        best_match = max(pattern_matches, key=lambda x: x["relevance"])
         
         # If relevance is high enough, try to adapt the pattern
         if best_match["relevance"] > 0.4:
@@ -273,58 +517,49 @@ class SkDuckyAIService:
         
         return None
 
+    def _loop_pattern_matches(self, prompt: str, prompt_concepts: set) -> List[Dict]:
+        """Pattern candidates among all examples sharing a concept, scored one by one"""
+        pattern_matches = []
+        for example in self.examples:
+            # Concepts and code structure are precomputed when the example is learned or loaded
+            example_concepts = set(example["features"]["concepts"])
+            
+            # Calculate concept similarity
+            concept_overlap = len(prompt_concepts.intersection(example_concepts))
+            if concept_overlap > 0:
+                code_structure = example["features"]["structure"]
+                
+                pattern_matches.append({
+                    "example": example,
+                    "concepts": example_concepts,
+                    "overlap": concept_overlap,
+                    "structure": code_structure,
+                    "relevance": self._calculate_pattern_relevance(prompt_concepts, example_concepts, code_structure)
+                })
+        return pattern_matches
+
+    def _vector_pattern_matches(self, prompt: str, prompt_concepts: set) -> List[Dict]:
+        """Best pattern candidate among all examples sharing a concept, scored with matrix products"""
+        matrix = self._example_matrix()
+        overlap = matrix.concepts @ matrix.concept_vector(prompt_concepts)
+        eligible = overlap > 0
+        if not eligible.any():
+            return []
+        
+        relevance = np.where(eligible, self._calculate_pattern_relevance_batch(matrix, prompt_concepts, overlap), -1.0)
+        best = int(np.argmax(relevance))
+        example = self.examples[best]
+        return [{
+            "example": example,
+            "concepts": set(example["features"]["concepts"]),
+            "overlap": int(overlap[best]),
+            "structure": example["features"]["structure"],
+            "relevance": float(relevance[best])
+        }]
+
     def _extract_concepts(self, text: str) -> set:
         """Extract key concepts from text"""
-        text = text.lower()
-        
-        # Define concept categories
-        concepts = set()
-        
-        # Events
-        if any(word in text for word in ["join", "connect", "enter"]):
-            concepts.add("join_event")
-        if any(word in text for word in ["death", "die", "dies", "kill"]):
-            concepts.add("death_event")
-        if any(word in text for word in ["break", "destroy"]):
-            concepts.add("break_event")
-        if any(word in text for word in ["place", "put"]):
-            concepts.add("place_event")
-        
-        # Actions
-        if any(word in text for word in ["give", "receive", "get"]):
-            concepts.add("give_action")
-        if any(word in text for word in ["kick", "remove"]):
-            concepts.add("kick_action")
-        if any(word in text for word in ["ban", "block"]):
-            concepts.add("ban_action")
-        if any(word in text for word in ["heal", "restore"]):
-            concepts.add("heal_action")
-        if any(word in text for word in ["teleport", "tp", "move"]):
-            concepts.add("teleport_action")
-        if any(word in text for word in ["fly", "flight"]):
-            concepts.add("fly_action")
-        if any(word in text for word in ["send", "message", "tell"]):
-            concepts.add("message_action")
-        
-        # Entities
-        if any(word in text for word in ["player", "user"]):
-            concepts.add("player_entity")
-        if any(word in text for word in ["mob", "monster", "zombie", "skeleton", "creeper"]):
-            concepts.add("mob_entity")
-        
-        # Items
-        if any(word in text for word in ["diamond", "emerald", "gold", "iron", "item"]):
-            concepts.add("item_concept")
-        
-        # Code structures
-        if any(word in text for word in ["command", "cmd"]):
-            concepts.add("command_structure")
-        if any(word in text for word in ["function", "func"]):
-            concepts.add("function_structure")
-        if any(word in text for word in ["event", "on", "when"]):
-            concepts.add("event_structure")
-        
-        return concepts
+        return self.concepts.prompt.extract(text)
 
     def _analyze_code_structure(self, code: str) -> dict:
         """Analyze the structure of code to understand patterns"""
@@ -352,26 +587,11 @@ class SkDuckyAIService:
             if "(" in first_line and ")" in first_line:
                 structure["has_parameters"] = True
         
-        # Analyze content
-        code_lower = code.lower()
-        if "permission" in code_lower:
-            structure["has_permissions"] = True
-        if any(word in code_lower for word in ["if", "else", "while"]):
-            structure["has_conditions"] = True
-        
-        # Extract actions
-        if "give" in code_lower:
-            structure["actions"].append("give")
-        if "kick" in code_lower:
-            structure["actions"].append("kick")
-        if "ban" in code_lower:
-            structure["actions"].append("ban")
-        if "heal" in code_lower:
-            structure["actions"].append("heal")
-        if "teleport" in code_lower:
-            structure["actions"].append("teleport")
-        if "send" in code_lower:
-            structure["actions"].append("send")
+        # Analyze content: actions and flags in a single pass over the code
+        found = self.concepts.code.extract(code)
+        structure["has_permissions"] = "has_permissions" in found
+        structure["has_conditions"] = "has_conditions" in found
+        structure["actions"] = [action for action in self.concepts.code_actions if action in found]
         
         return structure
 
@@ -405,6 +625,27 @@ class SkDuckyAIService:
         total_score = (concept_score * 0.5) + (structure_score * 0.3) + (action_score * 0.2)
         return min(total_score, 1.0)
 
+    def _calculate_pattern_relevance_batch(self, matrix: ExampleMatrix, prompt_concepts: set, overlap):
+        """Vectorized _calculate_pattern_relevance for every example in the matrix"""
+        if not prompt_concepts:
+            return np.zeros(matrix.size)
+        
+        # Concept overlap score (Jaccard)
+        union = len(prompt_concepts) + matrix.concept_counts - overlap
+        concept_score = np.divide(overlap, union, out=np.zeros(matrix.size), where=union > 0)
+        
+        # Structure compatibility score
+        wanted_types = np.array([f"{structure_type}_structure" in prompt_concepts
+                                 for structure_type in matrix.STRUCTURE_TYPES] + [False])
+        structure_score = 0.5 * wanted_types[matrix.structure_types]  # -1 (unknown) picks the trailing False
+        
+        # Action compatibility score
+        prompt_actions = [concept.replace("_action", "") for concept in prompt_concepts if concept.endswith("_action")]
+        action_score = 0.2 * (matrix.actions @ matrix.action_vector(prompt_actions))
+        
+        total_score = (concept_score * 0.5) + (structure_score * 0.3) + (action_score * 0.2)
+        return np.where(matrix.concept_counts > 0, np.minimum(total_score, 1.0), 0.0)
+
     def _adapt_code_pattern(self, prompt: str, pattern_match: dict) -> Optional[str]:
         """Adapt a code pattern to match the current prompt"""
         example = pattern_match["example"]
@@ -456,25 +697,6 @@ class SkDuckyAIService:
         
         return adapted_code if adapted_code != original_code else None
 
-    def _calculate_relevance_score(self, user_prompt: str, example_prompt: str) -> float:
-        """Calculate relevance between prompts using different methods"""
-        user_words = set(user_prompt.split())
-        example_words = set(example_prompt.split())
-        
-        # Exact word matches
-        common_words = user_words.intersection(example_words)
-        word_score = len(common_words) / max(len(user_words), len(example_words))
-        
-        # Substring matches
-        substring_score = 0
-        for word in user_words:
-            if any(word in ex_word or ex_word in word for ex_word in example_words):
-                substring_score += 1
-        substring_score = substring_score / len(user_words) if user_words else 0
-        
-        # Combined score
-        return (word_score * 0.7) + (substring_score * 0.3)
-
     def get_examples(self) -> List[Dict]:
         """Get all learned examples"""
         return sorted(self.examples, key=lambda x: x.get("usage_count", 0), reverse=True)
@@ -521,16 +743,6 @@ class SkDuckyAIService:
                 "ollama_learning": {}
             }
             
-            # Load existing feedback or create new list
-            feedback_path = "feedback_data.json"
-            feedback_data = []
-            if os.path.exists(feedback_path):
-                try:
-                    with open(feedback_path, "r", encoding="utf-8") as f:
-                        feedback_data = json.load(f)
-                except json.JSONDecodeError:
-                    feedback_data = []
-            
             # Process feedback intelligently for traditional system
             response_parts = []
             
@@ -546,6 +758,9 @@ class SkDuckyAIService:
                     response_parts.append("✅ Ollama learned from successful pattern")
                 
             elif feedback_type == "incorrect":
+                # Never serve this answer again from the generation cache
+                self.generation_cache.invalidate(prompt=normalize_prompt(prompt), code=code)
+                
                 if corrected_code:
                     # Learn the corrected example with enhanced metadata
                     corrected_example = {
@@ -559,7 +774,10 @@ class SkDuckyAIService:
                         "feedback_context": observations
                     }
                     self.examples.append(corrected_example)
-                    self.save_examples()
+                    self._index_example(len(self.examples) - 1)
+                    self._persist_new_example(len(self.examples) - 1)
+                    self.learning_stats.record_example(corrected_example)
+                    self.recent_activity.record_example(corrected_example)
                     feedback_entry["learning_actions"].append("learned_corrected_version")
                     
                     # Create specific error pattern to avoid in the future
@@ -599,14 +817,9 @@ class SkDuckyAIService:
                     response_parts.append("📝 Ollama learned partial improvements")
             
             # Save comprehensive feedback data
-            feedback_data.append(feedback_entry)
-            with open(feedback_path, "w", encoding="utf-8") as f:
-                json.dump(feedback_data, f, indent=2, ensure_ascii=False)
-            
-            # Save comprehensive feedback data
-            feedback_data.append(feedback_entry)
-            with open(feedback_path, "w", encoding="utf-8") as f:
-                json.dump(feedback_data, f, indent=2, ensure_ascii=False)
+            self.storage.append_record("feedback", feedback_entry)
+            self.learning_stats.record_feedback(feedback_entry)
+            self.recent_activity.record_feedback(feedback_entry)
             
             # Update Ollama's learning context file
             if self.ollama_enabled:
@@ -626,45 +839,48 @@ class SkDuckyAIService:
             "confidence": 0.0
         }
         
-        prompt_lower = prompt.lower()
-        code_lower = generated_code.lower()
-        obs_lower = observations.lower() if observations else ""
+        # One lexicon pass per text instead of a substring scan per keyword
+        targets = self.concepts.feedback_targets
+        prompt_terms = targets.extract(prompt)
+        code_terms = targets.extract(generated_code)
+        error_cues = self.concepts.feedback_errors.ordered(self.concepts.feedback_errors.extract(observations or ""))
+        error_type = error_cues[0] if error_cues else None
         
         # Identify error types based on observations and code analysis
         
         # 1. Wrong command structure
-        if any(word in obs_lower for word in ["wrong command", "incorrect syntax", "bad structure"]):
+        if error_type == "command_structure":
             analysis["error_type"] = "command_structure"
-            if "kick" in prompt_lower and "kick" not in code_lower:
+            if "kick" in prompt_terms and "kick" not in code_terms:
                 analysis["specific_issue"] = "generated wrong command type"
-            elif "<player>" not in generated_code and "player" in prompt_lower:
+            elif "<player>" not in code_terms and "player" in prompt_terms:
                 analysis["specific_issue"] = "missing required parameter"
             else:
                 analysis["specific_issue"] = "incorrect command structure"
             analysis["confidence"] = 0.8
         
         # 2. Wrong action/effect
-        elif any(word in obs_lower for word in ["wrong action", "doesn't do", "should", "instead"]):
+        elif error_type == "wrong_action":
             analysis["error_type"] = "wrong_action"
             # Extract what action was expected vs what was generated
             expected_actions = ["kick", "ban", "give", "heal", "teleport", "fly"]
             for action in expected_actions:
-                if action in prompt_lower and action not in code_lower:
+                if action in prompt_terms and action not in code_terms:
                     analysis["specific_issue"] = f"should use '{action}' action but didn't"
                     break
             analysis["confidence"] = 0.7
         
         # 3. Permission issues
-        elif any(word in obs_lower for word in ["permission", "op", "access"]):
+        elif error_type == "permission_issue":
             analysis["error_type"] = "permission_issue"
-            if "permission" not in code_lower:
+            if "permission" not in code_terms:
                 analysis["specific_issue"] = "missing permission check"
             else:
                 analysis["specific_issue"] = "incorrect permission level"
             analysis["confidence"] = 0.6
         
         # 4. Parameter problems
-        elif any(word in obs_lower for word in ["parameter", "argument", "missing", "arg"]):
+        elif error_type == "parameter_issue":
             analysis["error_type"] = "parameter_issue"
             if "<" not in generated_code or ">" not in generated_code:
                 analysis["specific_issue"] = "missing command parameters"
@@ -673,48 +889,46 @@ class SkDuckyAIService:
             analysis["confidence"] = 0.7
         
         # 5. Item/entity mismatches
-        elif any(word in obs_lower for word in ["item", "diamond", "emerald", "gold", "iron"]):
+        elif error_type == "item_mismatch":
             analysis["error_type"] = "item_mismatch"
             items = ["diamond", "emerald", "gold ingot", "iron ingot"]
             for item in items:
-                if item in prompt_lower and item not in code_lower:
+                if item in prompt_terms and item not in code_terms:
                     analysis["specific_issue"] = f"should give '{item}' but gave something else"
                     break
             analysis["confidence"] = 0.8
         
         # 6. Event type errors
-        elif any(word in obs_lower for word in ["event", "trigger", "when", "on"]):
+        elif error_type == "event_mismatch":
             analysis["error_type"] = "event_mismatch"
             events = ["join", "death", "break", "place"]
             for event in events:
-                if event in prompt_lower and f"on {event}" not in code_lower:
+                if event in prompt_terms and f"on {event}" not in code_terms:
                     analysis["specific_issue"] = f"should trigger on '{event}' event"
                     break
             analysis["confidence"] = 0.7
         
         # Analyze solution pattern from corrected code
         if corrected_code:
-            corrected_lower = corrected_code.lower()
+            corrected_terms = targets.extract(corrected_code)
             
             # Find what was fixed
             if analysis["error_type"] == "command_structure":
-                if "command /" in corrected_lower and "command /" not in code_lower:
+                if "command /" in corrected_terms and "command /" not in code_terms:
                     analysis["solution_pattern"] = "use proper 'command /' syntax"
-                elif "<player>" in corrected_code and "<player>" not in generated_code:
+                elif "<player>" in corrected_terms and "<player>" not in code_terms:
                     analysis["solution_pattern"] = "include <player> parameter"
             
             elif analysis["error_type"] == "wrong_action":
-                actions_in_correction = []
-                for action in ["kick", "ban", "give", "heal", "teleport"]:
-                    if action in corrected_lower:
-                        actions_in_correction.append(action)
+                actions_in_correction = [action for action in ["kick", "ban", "give", "heal", "teleport"]
+                                         if action in corrected_terms]
                 if actions_in_correction:
                     analysis["solution_pattern"] = f"use {', '.join(actions_in_correction)} action(s)"
             
             elif analysis["error_type"] == "item_mismatch":
                 items = ["diamond", "emerald", "gold ingot", "iron ingot"]
                 for item in items:
-                    if item in corrected_lower and item not in code_lower:
+                    if item in corrected_terms and item not in code_terms:
                         analysis["solution_pattern"] = f"give '{item}' specifically"
                         break
         
@@ -723,43 +937,38 @@ class SkDuckyAIService:
     def _create_error_pattern(self, prompt: str, incorrect_code: str, analysis: dict):
         """Create a specific error pattern to avoid in the future"""
         try:
-            error_patterns_path = "error_patterns.json"
-            error_patterns = []
-            
-            if os.path.exists(error_patterns_path):
-                with open(error_patterns_path, "r", encoding="utf-8") as f:
-                    error_patterns = json.load(f)
-            
             # Create specific error pattern
+            error_type = analysis["error_type"]
             error_pattern = {
                 "prompt_pattern": prompt.strip().lower(),
                 "incorrect_approach": {
                     "code_snippet": incorrect_code,
-                    "error_type": analysis["error_type"],
+                    "error_type": error_type,
                     "issue": analysis["specific_issue"]
                 },
-                "avoid_when": self._extract_concepts(prompt),
+                "avoid_when": sorted(self._extract_concepts(prompt)),
                 "severity": "high" if analysis["confidence"] > 0.7 else "medium",
                 "timestamp": datetime.now().isoformat(),
-                "occurrences": 1
+                "occurrences": 1,
+                "minhash": self.minhasher.signature(normalized_lines(incorrect_code))
             }
             
-            # Check if similar error pattern already exists
-            similar_found = False
-            for existing_pattern in error_patterns:
-                if (existing_pattern["prompt_pattern"] == error_pattern["prompt_pattern"] and
-                    existing_pattern["incorrect_approach"]["error_type"] == error_pattern["incorrect_approach"]["error_type"]):
-                    existing_pattern["occurrences"] += 1
-                    existing_pattern["timestamp"] = datetime.now().isoformat()
-                    similar_found = True
-                    break
+            def seen_again(existing_pattern: Dict):
+                existing_pattern["occurrences"] = existing_pattern.get("occurrences", 1) + 1
+                existing_pattern["timestamp"] = datetime.now().isoformat()
             
-            if not similar_found:
-                error_patterns.append(error_pattern)
+            # Check if similar error pattern already exists (saving only the changed pattern,
+            # found by its prompt in storage, since other workers may have stored it)
+            updated = self.storage.update_record(
+                "error_patterns", error_pattern["prompt_pattern"],
+                lambda existing_pattern: existing_pattern["incorrect_approach"]["error_type"] == error_type,
+                seen_again
+            )
+            if updated is None:
+                self.storage.append_record("error_patterns", error_pattern)
             
-            # Save error patterns
-            with open(error_patterns_path, "w", encoding="utf-8") as f:
-                json.dump(error_patterns, f, indent=2, ensure_ascii=False)
+            # Reload the in-memory index, picking up patterns other workers stored too
+            self.load_error_patterns()
                 
         except Exception:
             pass  # Non-critical, don't break the flow
@@ -767,34 +976,22 @@ class SkDuckyAIService:
     def _check_error_patterns(self, prompt: str, proposed_code: str) -> Optional[dict]:
         """Check if the proposed code matches any known error patterns"""
         try:
-            error_patterns_path = "error_patterns.json"
-            if not os.path.exists(error_patterns_path):
+            if not len(self.error_pattern_index):
                 return None
             
-            with open(error_patterns_path, "r", encoding="utf-8") as f:
-                error_patterns = json.load(f)
-            
-            prompt_concepts = self._extract_concepts(prompt)
-            
-            for pattern in error_patterns:
-                # Check if the current prompt has similar concepts to a known error pattern
-                pattern_concepts = set(pattern["avoid_when"])
-                concept_overlap = len(prompt_concepts.intersection(pattern_concepts))
-                
-                if concept_overlap >= 2:  # Significant overlap
-                    # Check if the proposed code is similar to the known incorrect approach
-                    code_similarity = self._calculate_code_similarity(proposed_code, pattern["incorrect_approach"]["code_snippet"])
-                    
-                    if code_similarity > 0.6:  # High similarity to known error
-                        return {
-                            "warning": True,
-                            "error_type": pattern["incorrect_approach"]["error_type"],
-                            "issue": pattern["incorrect_approach"]["issue"],
-                            "occurrences": pattern["occurrences"],
-                            "confidence": code_similarity
-                        }
+            # Significant concept overlap (2+) and high similarity to a known incorrect approach
+            match = self.error_pattern_index.match(self._extract_concepts(prompt), proposed_code)
+            if match is None:
+                return None
             
-            return None
+            pattern, code_similarity = match
+            return {
+                "warning": True,
+                "error_type": pattern["incorrect_approach"]["error_type"],
+                "issue": pattern["incorrect_approach"]["issue"],
+                "occurrences": pattern["occurrences"],
+                "confidence": code_similarity
+            }
             
         except Exception:
             return None
@@ -802,69 +999,188 @@ class SkDuckyAIService:
     def _calculate_code_similarity(self, code1: str, code2: str) -> float:
         """Calculate similarity between two code snippets"""
         # Simple similarity based on common lines and structure
-        lines1 = set(line.strip().lower() for line in code1.split('\n') if line.strip())
-        lines2 = set(line.strip().lower() for line in code2.split('\n') if line.strip())
-        
-        if not lines1 or not lines2:
-            return 0.0
-        
-        common_lines = len(lines1.intersection(lines2))
-        total_lines = len(lines1.union(lines2))
-        
-        return common_lines / total_lines if total_lines > 0 else 0.0
+        return line_similarity(normalized_lines(code1), normalized_lines(code2))
     
     def _boost_related_examples(self, prompt: str):
         """Increase usage count of examples related to successful feedback"""
         prompt = prompt.strip().lower()
-        for example in self.examples:
-            relevance = self._calculate_relevance_score(prompt, example["prompt"])
+        tokens = tokenize(prompt)
+        for example_id, relevance in self.ranker.normalized_scores(tokens).items():
             if relevance > 0.3:  # If reasonably related
+                example = self.examples[example_id]
                 example["usage_count"] = example.get("usage_count", 0) + 2  # Boost by 2
-        self.save_examples()
+                self.usage_counter.mark(example_id, 2)
     
     def _penalize_incorrect_examples(self, prompt: str, incorrect_code: str):
         """Mark examples as potentially problematic"""
         # For now, just log this. In the future, we could implement
         # a confidence scoring system or negative examples
         try:
-            penalty_path = "negative_examples.json"
-            penalties = []
-            if os.path.exists(penalty_path):
-                with open(penalty_path, "r", encoding="utf-8") as f:
-                    penalties = json.load(f)
-            
-            penalties.append({
+            self.storage.append_record("negative_examples", {
                 "prompt": prompt.strip().lower(),
                 "incorrect_code": incorrect_code,
                 "timestamp": datetime.now().isoformat()
             })
-            
-            with open(penalty_path, "w", encoding="utf-8") as f:
-                json.dump(penalties, f, indent=2, ensure_ascii=False)
                 
         except Exception:
             pass  # Non-critical, so don't break the flow
 
     def save_examples(self):
-        """Save examples with error handling"""
+        """Save examples with error handling (full snapshot, compacts the example log)"""
+        try:
+            self.storage.save_examples(self.examples)
+        except Exception as e:
+            print(f"Error saving examples: {e}")
+
+    def _persist_new_example(self, example_id: int):
+        """Persist a newly added example"""
         try:
-            with open(self.training_path, "w", encoding="utf-8") as f:
-                json.dump(self.examples, f, indent=2, ensure_ascii=False)
+            self.storage.append_example(example_id, self.examples[example_id])
+            if self.storage.needs_compaction():
+                self.save_examples()
         except Exception as e:
             print(f"Error saving examples: {e}")
 
+    def _write_usage_counts(self, increments: Dict[int, int]):
+        """Persist usage counter increments (background thread)"""
+        totals = self.storage.add_usage_counts(increments, self.examples)
+        # Other workers may have used the same examples: adopt the stored totals, plus what is still pending here
+        for example_id, total in totals.items():
+            self.examples[example_id]["usage_count"] = total + self.usage_counter.pending_amount(example_id)
+        if self.storage.needs_compaction():
+            self.save_examples()
+
+    def flush_usage_counts(self):
+        """Write pending usage counters now (called on shutdown)"""
+        self.usage_counter.flush()
+
     def load_examples(self):
         """Load examples with error handling"""
         try:
-            if os.path.exists(self.training_path):
-                with open(self.training_path, "r", encoding="utf-8") as f:
-                    self.examples = json.load(f)
+            if self.storage.examples_exist():
+                self.examples = self.storage.load_examples()
             else:
                 # Create initial examples if file doesn't exist
                 self._create_initial_examples()
         except Exception as e:
             print(f"Error loading examples: {e}")
             self._create_initial_examples()
+        
+        # Precompute features for examples saved before they existed (or by an older version),
+        # and fold any replayed log entries into a fresh snapshot
+        features_changed = sum(self._refresh_example_features(example) for example in self.examples)
+        if features_changed or self.storage.pending_entries:
+            self.save_examples()
+        self.example_index.rebuild(self.examples)
+        self.example_lsh.clear()
+        for example_id, example in enumerate(self.examples):
+            self.example_lsh.add(example_id, self._example_signature(example))
+
+    def _sync_storage(self):
+        """Pick up examples and error patterns other workers stored in shared storage, every few seconds"""
+        if not self.storage.shared or time.monotonic() - self.storage_synced_at < self.storage_sync_seconds:
+            return
+        self.storage_synced_at = time.monotonic()
+        try:
+            new_examples = self.storage.load_new_examples()
+            if self.storage.count_records("error_patterns") != len(self.error_pattern_index):
+                self.load_error_patterns()
+        except Exception as e:
+            print(f"Error syncing with storage: {e}")
+            return
+        for example in new_examples:
+            self.examples.append(example)
+            self._index_example(len(self.examples) - 1)
+            self.learning_stats.record_example(example)
+
+    def _index_example(self, example_id: int):
+        """Add or refresh one example in the token and MinHash indexes, computing its features if needed"""
+        example = self.examples[example_id]
+        self._refresh_example_features(example)
+        self.example_index.add(example_id, example.get("prompt", ""))
+        self.example_lsh.add(example_id, self._example_signature(example))
+
+    def _find_near_duplicate(self, example: Dict) -> Optional[Dict]:
+        """Most similar known example whose code is a near duplicate of this one's, if any"""
+        if not normalized_lines(example.get("code", "")):
+            return None
+        matches = self.example_lsh.near_duplicates(self._example_signature(example), self.near_duplicate_threshold)
+        return self.examples[matches[0][0]] if matches else None
+
+    def _example_signature(self, example: Dict) -> List[int]:
+        """MinHash of the example's code; kept in the LSH index only, never saved with the example"""
+        return self.minhasher.signature(normalized_lines(example.get("code", "")))
+
+    def _refresh_example_features(self, example: Dict) -> bool:
+        """Store concepts and code structure on the example; returns True if they were (re)computed"""
+        features = example.get("features")
+        if (features and features.get("version") == EXAMPLE_FEATURES_VERSION
+                and features.get("lexicon") == self.concepts.fingerprint):
+            return False
+        
+        example["features"] = {
+            "version": EXAMPLE_FEATURES_VERSION,
+            "lexicon": self.concepts.fingerprint,
+            "concepts": sorted(self._extract_concepts(example.get("prompt", ""))),
+            "structure": self._analyze_code_structure(example.get("code", ""))
+        }
+        return True
+
+    def _rank_examples(self, prompt: str, k: int, by_usage: bool = False) -> List[Tuple[Dict, float]]:
+        """Top-k (example, relevance) pairs by BM25, optionally breaking ties by usage count"""
+        return [(self.examples[example_id], score)
+                for example_id, score in self._rank_example_ids(prompt, k, by_usage)]
+
+    def _rank_example_ids(self, prompt: str, k: int, by_usage: bool = False) -> List[Tuple[int, float]]:
+        """Same as _rank_examples, but with example ids (positions in self.examples)"""
+        tiebreak = self._usage_count_of if by_usage else None
+        if self._use_vector_scoring():
+            return self._rank_example_ids_batch([prompt], k, tiebreak)[0]
+        return self.ranker.top_k(tokenize(prompt), k, tiebreak=tiebreak)
+
+    def _rank_all_example_ids(self, prompt: str) -> List[Tuple[int, float]]:
+        """Every (example id, relevance) with a positive BM25 score, best first, ties in insertion order"""
+        if self._use_vector_scoring():
+            return self._rank_example_ids_batch([prompt], len(self.examples))[0]
+        return self.ranker.ranked(tokenize(prompt))
+
+    def rank_prompts_batch(self, prompts: List[str], k: int = 5, by_usage: bool = False) -> List[List[Tuple[Dict, float]]]:
+        """Top-k (example, relevance) pairs for many prompts at once, e.g. for bulk evaluation runs"""
+        if self.example_matrix is None:
+            return [self._rank_examples(prompt, k, by_usage) for prompt in prompts]
+        
+        tiebreak = self._usage_count_of if by_usage else None
+        return [[(self.examples[example_id], score) for example_id, score in ranked]
+                for ranked in self._rank_example_ids_batch(prompts, k, tiebreak)]
+
+    def _rank_example_ids_batch(self, prompts: List[str], k: int, tiebreak=None) -> List[List[Tuple[int, float]]]:
+        """Score a batch of prompts against every example with the NumPy matrix"""
+        scores = self._example_matrix().normalized_bm25_batch([tokenize(prompt) for prompt in prompts])
+        return [[(example_id, float(row[example_id])) for example_id in top_k_indices(row, k, tiebreak)]
+                for row in scores]
+
+    def _usage_count_of(self, example_id: int) -> int:
+        return self.examples[example_id].get("usage_count", 0)
+
+    def _use_vector_scoring(self) -> bool:
+        """Whether retrieval should go through the NumPy example matrix"""
+        if self.example_matrix is None or self.vector_scoring == "off":
+            return False
+        return self.vector_scoring == "on" or len(self.examples) >= self.vector_scoring_min_examples
+
+    def _example_matrix(self) -> ExampleMatrix:
+        """Example matrix, rebuilt if examples were added since it was last used"""
+        self.example_matrix.refresh(self.examples, self.concepts.tables["prompt_concepts"], self.concepts.code_actions)
+        return self.example_matrix
+
+    def load_error_patterns(self):
+        """Load known error patterns into memory (at startup and after changes), so checks never read storage"""
+        patterns = []
+        try:
+            patterns = self.storage.load_records("error_patterns")
+        except Exception as e:
+            print(f"Error loading error patterns: {e}")
+        self.error_pattern_index.rebuild(patterns)
 
     def load_knowledge_base(self):
         """Load knowledge base"""
@@ -878,6 +1194,7 @@ class SkDuckyAIService:
         except Exception as e:
             print(f"Error loading knowledge base: {e}")
             self._create_initial_knowledge()
+        self.concepts = ConceptExtractor(self.knowledge.get("concept_lexicon"))
 
     def save_knowledge_base(self):
         """Save knowledge base"""
@@ -915,8 +1232,12 @@ class SkDuckyAIService:
                 "usage_count": 0
             }
         ]
-        self.examples = initial_examples
-        self.save_examples()
+        # Another worker sharing the storage may have seeded it first; use whatever is stored then
+        try:
+            self.examples = self.storage.seed_examples(initial_examples)
+        except Exception as e:
+            print(f"Error saving examples: {e}")
+            self.examples = initial_examples
 
     def _create_initial_knowledge(self):
         """Create initial knowledge base"""
@@ -948,14 +1269,39 @@ class SkDuckyAIService:
             ]
         }
 
-    def _check_ollama_availability(self):
+    async def start_ollama(self):
+        """Check Ollama (and pull the model if needed); run in the background after startup"""
+        if not self.ollama_configured:
+            print("🦆 Ollama disabled by configuration")
+            return
+        
+        print(f"🦆 Checking Ollama availability at {self.ollama_base_url}...")
+        self.ollama_state = "checking"
+        await self._check_ollama_availability()
+        if self.ollama_enabled:
+            print(f"✅ Ollama connected! Using {self.ollama_model}")
+            await self.warm_up_model()
+        else:
+            print("❌ Ollama not available, using examples only")
+
+    async def close(self):
+        """Close pooled Ollama connections (shutdown hook)"""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+        for task in self._warmup_tasks.values():
+            task.cancel()
+        await self.job_workers.stop()
+        await self.ollama_client.aclose()
+
+    async def _check_ollama_availability(self):
         """Check if Ollama is available and try to ensure CodeLlama model"""
         try:
             # First check if Ollama service is running
-            response = requests.get(f"{self.ollama_base_url}/api/tags", timeout=10)
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                model_names = [model.get("name", "") for model in models]
+            started = time.monotonic()
+            status_code, data = await self.ollama_client.get("/api/tags", timeout=10)
+            if status_code == 200:
+                self.ollama_breaker.record_success(time.monotonic() - started)
+                model_names = self._remember_ollama_models(data)
                 
                 # Check if CodeLlama is available
                 codellama_available = any("codellama" in name.lower() for name in model_names)
@@ -963,29 +1309,137 @@ class SkDuckyAIService:
                 if codellama_available:
                     print("✅ CodeLlama model found and ready!")
                     self.ollama_enabled = True
+                    self.ollama_state = "ready"
                 else:
                     print("⚠️ CodeLlama not found, trying to pull...")
-                    # Try to pull CodeLlama
-                    pull_response = requests.post(
-                        f"{self.ollama_base_url}/api/pull",
-                        json={"name": "codellama"},
-                        timeout=300  # 5 minutes for model download
-                    )
-                    if pull_response.status_code == 200:
+                    self.ollama_state = "pulling"
+                    if await self._pull_ollama_model():
                         print("✅ CodeLlama downloaded successfully!")
+                        self.ollama_health["models"].append(self.ollama_model)
                         self.ollama_enabled = True
+                        self.ollama_state = "ready"
                     else:
                         print("❌ Failed to download CodeLlama")
                         self.ollama_enabled = False
+                        self.ollama_state = "missing_model"
             else:
-                print(f"❌ Ollama service not responding (status: {response.status_code})")
+                print(f"❌ Ollama service not responding (status: {status_code})")
+                self.ollama_breaker.trip(f"status {status_code}")
                 self.ollama_enabled = False
+                self.ollama_state = "unavailable"
                 
         except Exception as e:
             print(f"❌ Ollama connection failed: {e}")
+            self.ollama_breaker.trip(e)
             self.ollama_enabled = False
+            self.ollama_state = "unavailable"
+    
+    async def _pull_ollama_model(self) -> bool:
+        """Pull the model, keeping the latest progress in ollama_pull_progress for /ready"""
+        try:
+            # Streamed, so the timeout bounds each progress update rather than the whole download
+            async for update in self.ollama_client.stream("/api/pull", {"name": self.ollama_model}, timeout=60):
+                if update.get("error"):
+                    print(f"❌ Pull error: {update['error']}")
+                    return False
+                self.ollama_pull_progress = {
+                    "status": update.get("status", ""),
+                    "completed": update.get("completed"),
+                    "total": update.get("total")
+                }
+                if update.get("status") == "success":
+                    return True
+            return False
+        except Exception as e:
+            print(f"❌ Pull failed: {e}")
+            return False
+    
+    def _remember_ollama_models(self, tags: Dict) -> List[str]:
+        """Cache the model names from an /api/tags response"""
+        model_names = [model.get("name", "") for model in tags.get("models", [])]
+        self.ollama_health = {"models": model_names, "checked_at": datetime.now().isoformat()}
+        return model_names
+    
+    def _ollama_ready(self) -> bool:
+        """Whether generations should go to Ollama right now (starts a background probe when one is due)"""
+        if self.ollama_breaker.allow_request():
+            return self.ollama_enabled
+        self._schedule_probe()
+        return False
+    
+    def _schedule_probe(self):
+        if self.ollama_breaker.probe_due and (self._probe_task is None or self._probe_task.done()):
+            self._probe_task = asyncio.ensure_future(self._probe_ollama())
+    
+    async def _probe_ollama(self):
+        """Half-open probe: one cheap /api/tags call closes the breaker again or reopens it for longer"""
+        started = time.monotonic()
+        try:
+            status_code, data = await self.ollama_client.get("/api/tags", timeout=5)
+        except Exception as e:
+            status_code, data = None, e
+        
+        if status_code == 200:
+            self.ollama_breaker.record_success(time.monotonic() - started)
+            model_names = self._remember_ollama_models(data)
+            self.ollama_enabled = any("codellama" in name.lower() for name in model_names)
+            self.ollama_state = "ready" if self.ollama_enabled else "missing_model"
+            print(f"✅ Ollama is back{'' if self.ollama_enabled else ' (but CodeLlama is missing)'}")
+            if self.ollama_enabled and not self.model_warmth.is_warm(self.ollama_model):
+                self._schedule_warm_up(self.ollama_model)
+        else:
+            self.ollama_breaker.record_failure(data if status_code is None else f"status {status_code}")
+            self.ollama_state = "unavailable"
+            print(f"❌ Ollama probe failed, retrying in {self.ollama_breaker.open_timeout:.0f}s")
+    
+    async def warm_up_model(self, model: Optional[str] = None) -> bool:
+        """Load a model into Ollama's memory with an empty request, so the first real generation doesn't pay for it"""
+        model = model or self.ollama_model
+        self.model_warmth.mark_loading(model)
+        print(f"🔥 Warming up {model}...")
+        started = time.monotonic()
+        try:
+            status_code, data = await self.ollama_client.post(
+                "/api/generate",
+                {"model": model, "prompt": "", "keep_alive": self.ollama_keep_alive},
+                timeout=self.ollama_cold_timeout
+            )
+        except httpx.HTTPError as e:
+            print(f"❌ Warm-up of {model} failed: {e}")
+            self.model_warmth.mark_failed(model, e)
+            return False
+        
+        if status_code != 200:
+            print(f"❌ Warm-up of {model} failed (status: {status_code})")
+            self.model_warmth.mark_failed(model, f"status {status_code}")
+            return False
+        
+        load_seconds = data.get("load_duration", 0) / 1e9 or time.monotonic() - started
+        self.model_warmth.mark_used(model, load_seconds)
+        print(f"✅ {model} is warm (loaded in {load_seconds:.1f}s)")
+        return True
+    
+    def _schedule_warm_up(self, model: str):
+        """Warm up ``model`` in the background (no-op outside an event loop or if already warming)"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = self._warmup_tasks.get(model)
+        if task is None or task.done():
+            self.model_warmth.mark_loading(model)
+            self._warmup_tasks[model] = asyncio.ensure_future(self.warm_up_model(model))
+    
+    def _generation_timeout(self, model: str) -> float:
+        """Normal timeout for a loaded model; a cold one gets time to load first"""
+        return self.ollama_timeout if self.model_warmth.is_warm(model) else self.ollama_cold_timeout
+    
+    def _record_model_use(self, model: str, response: Dict):
+        """Keep the warm/cold state current from a finished /api/generate response"""
+        self.model_warmth.mark_used(model, response.get("load_duration", 0) / 1e9)
     
-    def generate_with_ollama_hybrid(self, prompt: str, relevant_examples: List[Dict], include_explanation: bool = False) -> Dict:
+    async def generate_with_ollama_hybrid(self, prompt: str, relevant_examples: List[Dict], include_explanation: bool = False,
+                                          session_id: Optional[str] = None) -> Dict:
         """🦆 HYBRID: Generate Skript code using Ollama AI + learned examples context"""
         if not self.ollama_enabled:
             return {
@@ -995,60 +1449,18 @@ class SkDuckyAIService:
             }
         
         try:
-            # Build context with relevant examples for CodeLlama
-            examples_context = self._build_examples_context_for_ollama(relevant_examples, prompt)
+            # Enhanced prompt with examples as context
+            payload, budget = self._build_hybrid_payload(prompt, relevant_examples, session_id)
             
-            # Enhanced prompt with examples and Skript expertise
-            enhanced_prompt = f"""You are SkDucky 🦆, an expert Skript developer duck! You learn from examples and create better code.
-
-🦆 DUCKY'S HYBRID APPROACH:
-1. ANALYZE the relevant examples I found for this request
-2. LEARN from their syntax, patterns, and structure  
-3. GENERATE improved code using that knowledge
-4. EXPLAIN what you learned from the examples
-
-🏗️ SKRIPT SYNTAX RULES:
-- Use proper indentation (4 spaces)
-- Commands: 'command /name:' with 'trigger:' block
-- Events: 'on event:' format
-- Messages: 'send "text" to player'
-- Items: 'give X Y to player'
-
-REQUEST: {prompt}
-
-🔍 RELEVANT EXAMPLES I FOUND:
-{examples_context}
-
-📝 INSTRUCTIONS:
-- Use the examples' syntax patterns and structure
-- Improve upon them if possible
-- Explain what you learned from each example
-- Generate clean, working Skript code
-
-Generate ONLY the Skript code, followed by explanation if requested."""
-
             # Make request to Ollama
-            response = requests.post(
-                f"{self.ollama_base_url}/api/generate",
-                json={
-                    "model": self.ollama_model,
-                    "prompt": enhanced_prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3,  # Lower for more consistent code
-                        "top_p": 0.9,
-                        "top_k": 50,
-                        "num_predict": 300
-                    }
-                },
-                timeout=15
-            )
+            status_code, data = await self._post_generate(payload)
 
-            if response.status_code == 200:
-                result_text = response.json().get("response", "").strip()
+            if status_code == 200:
+                self._remember_session_context(session_id, payload, data)
+                result_text = data.get("response", "").strip()
                 
                 # Extract code from response
-                code = self._extract_code_from_ollama_response(result_text)
+                code = self._clean_ollama_generated_code(result_text)
                 
                 if code:
                     result = {
@@ -1056,7 +1468,8 @@ Generate ONLY the Skript code, followed by explanation if requested."""
                         "message": f"🦆 Quack! Generated with CodeLlama + {len(relevant_examples)} learned examples! ✨",
                         "model_used": self.ollama_model,
                         "source": "hybrid_ollama_examples",
-                        "examples_used": [ex.get("prompt", "") for ex in relevant_examples[:3]]
+                        "examples_used": [piece.label for piece in budget.included],
+                        "model_info": f"{self.ollama_model} + {budget.summary()}"
                     }
                     
                     if include_explanation:
@@ -1068,13 +1481,89 @@ Generate ONLY the Skript code, followed by explanation if requested."""
                     # Fallback to learning system when Ollama gives no code
                     print("🦆 Ollama gave no code - falling back to learning system")
                     return self._fallback_to_examples(prompt, relevant_examples, include_explanation)
+            
+            print(f"🦆 Ollama API error: {status_code} - falling back to learning system")
+            return self._fallback_to_examples(prompt, relevant_examples, include_explanation)
                     
+        except GenerationQueueFull as e:
+            # Don't wait in a long queue when the examples can answer right away
+            print(f"🦆 Ollama busy: {e} - falling back to learning system")
+            result = self._fallback_to_examples(prompt, relevant_examples, include_explanation)
+            result["message"] = f"🦆 CodeLlama is busy (~{e.eta_seconds:.0f}s wait), so I used my learned examples right away! ✨"
+            return result
+        
+        except CircuitOpenError:
+            result = self._fallback_to_examples(prompt, relevant_examples, include_explanation)
+            result["message"] = "🦆 CodeLlama is unavailable right now, so I used my learned examples! ✨"
+            return result
+        
         except Exception as e:
             # Fallback to learning system on any error
             print(f"🦆 Ollama hybrid error: {e} - falling back to learning system")
             return self._fallback_to_examples(prompt, relevant_examples, include_explanation)
 
-    def generate_with_ollama(self, prompt: str, include_explanation: bool = False) -> Dict:
+    def _build_hybrid_payload(self, prompt: str, relevant_examples: List[Dict], session_id: Optional[str] = None) -> Tuple[Dict, PromptBudget]:
+        """Ollama /api/generate payload for the hybrid (examples as context) prompt, with as many
+        of the relevant examples as fit the context window (continuing the session's context, if any)"""
+        session_context = self._session_context(session_id)
+        # The examples come best first from the ranker (BM25, then usage); their relevance keeps that order
+        pieces = [PromptPiece("example", example.get("prompt", ""), self._example_context_block(i, example),
+                              1.0 / i, source=example)
+                  for i, example in enumerate(relevant_examples, 1)]
+        budget = PromptBudget(self.ollama_num_ctx - len(session_context or []), self.hybrid_options["num_predict"])
+        budget.pack(self._hybrid_prompt(prompt, EXAMPLES_CONTEXT_FOOTER, continued=bool(session_context)), pieces, {"example": 3})
+        
+        # Build context with relevant examples for CodeLlama
+        examples_context = self._build_examples_context_for_ollama([piece.source for piece in budget.included], prompt)
+        payload = {
+            "model": self.ollama_model,
+            "prompt": self._hybrid_prompt(prompt, examples_context, continued=bool(session_context)),
+            "stream": False,
+            "keep_alive": self.ollama_keep_alive,
+            "options": dict(self.hybrid_options)
+        }
+        if session_context:
+            payload["context"] = session_context
+        return payload, budget
+    
+    def _session_context(self, session_id: Optional[str]) -> Optional[List[int]]:
+        """Ollama context tokens from the session's last generation, if they are for the current
+        model and leave at least half of the window for the next prompt and answer"""
+        if not session_id:
+            return None
+        entry = self.session_contexts.get(session_id)
+        if entry is None:
+            return None
+        model, tokens = entry
+        if model != self.ollama_model or len(tokens) > self.ollama_num_ctx // 2:
+            self.session_contexts.invalidate(prompt=session_id)  # start over with the full prompt
+            return None
+        return tokens
+    
+    def _session_cache_key(self, session_id: Optional[str]) -> Optional[Tuple]:
+        """Part of the cache key for a session's request: its id and the context it continues from"""
+        if not session_id:
+            return None
+        tokens = self._session_context(session_id)
+        return (session_id, hash(tuple(tokens)) if tokens else None)
+    
+    def _remember_session_context(self, session_id: Optional[str], payload: Dict, response: Dict):
+        """Keep the context Ollama returned so the session's next prompt can skip the instructions"""
+        if session_id and response.get("context"):
+            self.session_contexts.put(session_id, session_id, (payload["model"], response["context"]))
+    
+    def _hybrid_prompt(self, prompt: str, examples_context: str, continued: bool = False) -> str:
+        """Fixed instructions first, then the examples, then the request. A continued session
+        already has the instructions in its Ollama context, so it only gets the request part."""
+        request_part = f"""🔍 RELEVANT EXAMPLES I FOUND:
+{examples_context}
+
+REQUEST: {prompt}
+
+Generate ONLY the Skript code, followed by explanation if requested."""
+        return request_part if continued else f"{HYBRID_PROMPT_PREFIX}\n\n{request_part}"
+
+    async def generate_with_ollama(self, prompt: str, include_explanation: bool = False, session_id: Optional[str] = None) -> Dict:
         """Generate Skript code using Ollama AI with enhanced context"""
         if not self.ollama_enabled:
             return {
@@ -1084,41 +1573,12 @@ Generate ONLY the Skript code, followed by explanation if requested."""
             }
         
         try:
-            # Build comprehensive context for Ollama
-            context = self._build_skript_context_for_ollama(prompt)
-            
             # Create enhanced prompt with Skript-specific instructions and duck personality
-            enhanced_prompt = f"""You are SkDucky 🦆, an expert Skript developer duck! You're helpful, friendly, and love clean code.
-
-🦆 DUCKY'S SKRIPT RULES:
-- Use proper indentation (4 spaces) - ducks like organized nests!
-- Always end event/command lines with colons
-- Use 'give X Y to player' for items
-- Use 'send "message" to player' for messages
-- Commands start with 'command /name:'
-- Events start with 'on event:'
-
-🏗️ DUCKY'S CODE STRUCTURE (in this order):
-1. Options (if needed)
-2. Commands 
-3. Events
-4. Functions (PRIORITIZE functions for complex logic!)
-
-📋 FUNCTION PRIORITY RULE:
-- If the logic is more than 3-4 lines, CREATE A FUNCTION!
-- Keep events clean by calling functions
-- Example: Instead of long code in "on join:", create a "welcomePlayer()" function
-
-REQUEST: {prompt}
-
-RELEVANT EXAMPLES:
-{context}
-
-🦆 Generate clean, well-structured Skript code. If it's complex, use functions to keep it tidy!
-Remember: A happy duck writes organized code! 🦆✨"""
+            session_context = self._session_context(session_id)
+            enhanced_prompt, budget = self._build_ollama_prompt(prompt, session_context)
 
             # Call Ollama API
-            response = self._call_ollama_api(enhanced_prompt)
+            response = await self._call_ollama_api(enhanced_prompt, session_id, session_context)
             
             if response:
                 code = self._clean_ollama_generated_code(response)
@@ -1127,11 +1587,12 @@ Remember: A happy duck writes organized code! 🦆✨"""
                     "code": code,
                     "message": "🦆 Quack! Code generated with Ollama's magic duck powers! ✨",
                     "model_used": self.ollama_model,
-                    "source": "ollama"
+                    "source": "ollama",
+                    "model_info": f"{self.ollama_model} + {budget.summary()}"
                 }
                 
                 if include_explanation:
-                    explanation = self._generate_ollama_explanation(prompt, code)
+                    explanation = await self._generate_ollama_explanation(prompt, code)
                     result["explanation"] = f"🦆 {explanation}"
                     
                 return result
@@ -1139,18 +1600,18 @@ Remember: A happy duck writes organized code! 🦆✨"""
                 # Fallback to learning system when Ollama fails
                 print("🦆 Ollama timeout/error - falling back to learning system")
                 fallback_request = AIRequest(prompt=prompt, include_explanation=include_explanation)
-                fallback_result = self.generate_code(fallback_request)
+                fallback_result = await self.generate_code(fallback_request)
                 fallback_result.message = "🦆 Ollama was slow, so I used my learned examples instead! Still good code! ✨"
-                return fallback_result.dict()
+                return fallback_result.model_dump()
                 
         except Exception as e:
             # Fallback to learning system on any error
             print(f"🦆 Ollama error: {e} - falling back to learning system")
             try:
                 fallback_request = AIRequest(prompt=prompt, include_explanation=include_explanation)
-                fallback_result = self.generate_code(fallback_request)
+                fallback_result = await self.generate_code(fallback_request)
                 fallback_result.message = f"🦆 Ollama had trouble ({str(e)[:50]}...), but I used my learned examples! ✨"
-                return fallback_result.dict()
+                return fallback_result.model_dump()
             except Exception as fallback_error:
                 return {
                     "code": "",
@@ -1158,42 +1619,150 @@ Remember: A happy duck writes organized code! 🦆✨"""
                     "error": str(e)
                 }
     
-    def _build_skript_context_for_ollama(self, prompt: str) -> str:
-        """Build comprehensive context from examples, knowledge, and learning feedback"""
+    async def stream_generation(self, request: AIRequest, hybrid: bool = True) -> AsyncIterator[Dict]:
+        """Relay Ollama's tokens as they are generated, as a sequence of events:
+        
+        - ``{"type": "queued", "position": ..., "eta_seconds": ...}`` when waiting for a free Ollama slot
+        - ``{"type": "token", "text": ...}`` raw model output, as soon as it arrives
+        - ``{"type": "code", "delta": ...}`` cleaned code, released line by line
+        - ``{"type": "done", "code": ..., ...}`` the final result (same fields as the non-streaming calls)
+        
+        Falls back to the learned examples (a single ``done`` event) when Ollama is off or fails.
+        """
+        prompt = request.prompt
+        relevant_examples = self._find_relevant_examples(prompt.strip().lower()) if hybrid else []
+        
+        if self._ollama_ready():
+            if hybrid:
+                payload, budget = self._build_hybrid_payload(prompt, relevant_examples, request.session_id)
+            else:
+                session_context = self._session_context(request.session_id)
+                enhanced_prompt, budget = self._build_ollama_prompt(prompt, session_context)
+                payload = self._ollama_payload(enhanced_prompt, session_context)
+            payload["stream"] = True
+            cleaner = IncrementalCodeCleaner(self._clean_ollama_generated_code)
+            ticket = None
+            
+            try:
+                ticket = self.generation_scheduler.enter()
+                if ticket.position:
+                    yield {"type": "queued", "position": ticket.position, "eta_seconds": round(ticket.eta_seconds, 1)}
+                await ticket.wait()
+                
+                started = time.monotonic()
+                timeout = self._generation_timeout(payload["model"])
+                async for chunk in self.ollama_client.stream("/api/generate", payload, timeout=timeout):
+                    if started is not None:
+                        # Time to first token is what tells a struggling server apart
+                        self.ollama_breaker.record_success(time.monotonic() - started)
+                        started = None
+                    token = chunk.get("response", "")
+                    if token:
+                        yield {"type": "token", "text": token}
+                        delta = cleaner.feed(token)
+                        if delta:
+                            yield {"type": "code", "delta": delta}
+                    if chunk.get("done"):
+                        self._record_model_use(payload["model"], chunk)
+                        self._remember_session_context(request.session_id, payload, chunk)
+                        break
+                
+                # The slot is only for the token stream; an explanation asks the scheduler for its own
+                ticket.release()
+                delta = cleaner.finish()
+                if delta:
+                    yield {"type": "code", "delta": delta}
+                
+                if cleaner.code:
+                    result = {
+                        "type": "done",
+                        "code": cleaner.code,
+                        "model_used": self.ollama_model,
+                        "source": "hybrid_ollama_examples" if hybrid else "ollama",
+                        "model_info": f"{self.ollama_model} + {budget.summary()}"
+                    }
+                    if hybrid:
+                        result["message"] = f"🦆 Quack! Generated with CodeLlama + {len(relevant_examples)} learned examples! ✨"
+                        result["examples_used"] = [piece.label for piece in budget.included]
+                        if request.include_explanation:
+                            result["explanation"] = self._generate_hybrid_explanation(prompt, cleaner.code, relevant_examples)
+                    else:
+                        result["message"] = "🦆 Quack! Code generated with Ollama's magic duck powers! ✨"
+                        if request.include_explanation:
+                            result["explanation"] = f"🦆 {await self._generate_ollama_explanation(prompt, cleaner.code)}"
+                    yield result
+                    return
+                
+                print("🦆 Ollama gave no code - falling back to learning system")
+            except GenerationQueueFull as e:
+                print(f"🦆 Ollama busy: {e} - falling back to learning system")
+            except Exception as e:
+                print(f"🦆 Ollama streaming error: {e} - falling back to learning system")
+                if isinstance(e, httpx.HTTPError):
+                    self.ollama_breaker.record_failure(e)
+            finally:
+                if ticket is not None:
+                    ticket.release()
+        
+        fallback = self.generate_from_examples(AIRequest(prompt=prompt, include_explanation=request.include_explanation))
+        yield {"type": "done", **fallback.model_dump(), "source": fallback.source or "examples"}
+    
+    def _build_ollama_prompt(self, prompt: str, session_context: Optional[List[int]] = None) -> Tuple[str, PromptBudget]:
+        """Ollama-only prompt: Skript rules plus the examples, knowledge patterns and feedback notes that fit the context window
+        (what is left of it after ``session_context``, the tokens a continued session already has)"""
+        # Build comprehensive context for Ollama
+        continued = bool(session_context)
+        pieces = self._build_skript_context_for_ollama(prompt)
+        budget = PromptBudget(self.ollama_num_ctx - len(session_context or []), self.ollama_options["num_predict"])
+        budget.pack(self._ollama_only_prompt(prompt, FEEDBACK_CONTEXT_HEADER, continued), pieces, {"example": 3, "feedback": 3})
+        
+        context_parts = [piece.text for piece in budget.included if piece.kind != "feedback"]
+        feedback_notes = [piece.text for piece in budget.included if piece.kind == "feedback"]
+        if feedback_notes:
+            context_parts.append(FEEDBACK_CONTEXT_HEADER)
+            context_parts.extend(feedback_notes)
+        
+        return self._ollama_only_prompt(prompt, "\n\n".join(context_parts), continued), budget
+    
+    def _ollama_only_prompt(self, prompt: str, context: str, continued: bool = False) -> str:
+        """Same layout as _hybrid_prompt: fixed rules, then context, then the request"""
+        request_part = f"""RELEVANT EXAMPLES:
+{context}
+
+REQUEST: {prompt}
+
+🦆 Generate clean, well-structured Skript code. If it's complex, use functions to keep it tidy!
+Remember: A happy duck writes organized code! 🦆✨"""
+        return request_part if continued else f"{OLLAMA_PROMPT_PREFIX}\n\n{request_part}"
+
+    def _build_skript_context_for_ollama(self, prompt: str) -> List[PromptPiece]:
+        """Candidate context from examples, knowledge, and learning feedback, for the prompt budget to choose from"""
         context_parts = []
         prompt_lower = prompt.lower()
+        prompt_words = set(prompt_lower.split())
         
-        # Get relevant examples from existing training data
-        relevant_examples = []
-        for example in self.examples:
-            if any(word in example["prompt"].lower() for word in prompt_lower.split()):
-                relevant_examples.append(f"# {example['prompt']}:\n{example['code']}")
-        
-        context_parts.extend(relevant_examples[:3])  # Limit to 3 most relevant
+        # Get relevant examples from existing training data (the budget keeps at most 3, by BM25 relevance)
+        for example, relevance in self._rank_examples(prompt_lower, 5):
+            context_parts.append(PromptPiece("example", example["prompt"], f"# {example['prompt']}:\n{example['code']}",
+                                             relevance))
         
         # Add knowledge patterns if available
         if hasattr(self, 'knowledge') and 'patterns' in self.knowledge:
             for pattern_name, pattern_info in self.knowledge['patterns'].items():
                 if any(word in pattern_name.lower() for word in prompt_lower.split()):
-                    context_parts.append(f"# {pattern_info['description']}:\n{pattern_info['template']}")
+                    context_parts.append(PromptPiece("pattern", pattern_name,
+                                                     f"# {pattern_info['description']}:\n{pattern_info['template']}",
+                                                     prompt_overlap(prompt_words, f"{pattern_name} {pattern_info['description']}")))
         
         # Add Ollama-specific learning context
-        ollama_context = self._get_ollama_learning_context(prompt)
-        if ollama_context:
-            context_parts.append("# IMPORTANT LEARNING FROM FEEDBACK:")
-            context_parts.extend(ollama_context)
+        context_parts.extend(self._get_ollama_learning_context(prompt))
         
-        return "\n\n".join(context_parts)
+        return context_parts
 
-    def _get_ollama_learning_context(self, prompt: str) -> List[str]:
+    def _get_ollama_learning_context(self, prompt: str) -> List[PromptPiece]:
         """Get relevant learning context from previous Ollama feedback"""
         try:
-            context_path = "ollama_learning_context.json"
-            if not os.path.exists(context_path):
-                return []
-            
-            with open(context_path, "r", encoding="utf-8") as f:
-                learning_data = json.load(f)
+            learning_data = self.storage.load_records("ollama_learning_context", limit=20)
             
             relevant_context = []
             prompt_words = set(prompt.lower().split())
@@ -1205,49 +1774,83 @@ Remember: A happy duck writes organized code! 🦆✨"""
                 # Check for word overlap
                 if prompt_words.intersection(example_words):
                     if example["type"] == "positive_feedback":
-                        relevant_context.append(f"✅ SUCCESSFUL PATTERN: {example['training_prompt'][:200]}...")
+                        note = f"✅ SUCCESSFUL PATTERN: {example['training_prompt'][:200]}..."
                     elif example["type"] == "correction_training":
-                        relevant_context.append(f"⚠️ AVOID THIS MISTAKE: {example['training_prompt'][:200]}...")
+                        note = f"⚠️ AVOID THIS MISTAKE: {example['training_prompt'][:200]}..."
                     elif example["type"] == "negative_feedback":
-                        relevant_context.append(f"❌ DON'T USE: {example['training_prompt'][:200]}...")
+                        note = f"❌ DON'T USE: {example['training_prompt'][:200]}..."
+                    else:
+                        continue
+                    relevance = len(prompt_words & example_words) / len(prompt_words)
+                    relevant_context.append(PromptPiece("feedback", example.get("prompt", ""), note, relevance))
             
-            return relevant_context[:3]  # Limit to 3 most relevant
+            return relevant_context  # The prompt budget keeps the 3 most relevant that fit
             
         except Exception as e:
             print(f"Error getting Ollama learning context: {e}")
             return []
     
-    def _call_ollama_api(self, prompt: str) -> Optional[str]:
+    async def _call_ollama_api(self, prompt: str, session_id: Optional[str] = None,
+                               session_context: Optional[List[int]] = None) -> Optional[str]:
         """Make API call to Ollama"""
         try:
-            url = f"{self.ollama_base_url}/api/generate"
-            
-            payload = {
-                "model": self.ollama_model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.2,  # Lower temperature for faster, more consistent code
-                    "top_p": 0.8,
-                    "num_predict": 300,  # Limit output length for faster response
-                    "num_ctx": 2048,     # Smaller context for faster processing
-                    "repeat_penalty": 1.1
-                }
-            }
+            payload = self._ollama_payload(prompt, session_context)
             
-            # Reduced timeout for faster user experience
-            response = requests.post(url, json=payload, timeout=15)
+            status_code, result = await self._post_generate(payload)
             
-            if response.status_code == 200:
-                result = response.json()
+            if status_code == 200:
+                self._remember_session_context(session_id, payload, result)
                 return result.get("response", "")
             else:
-                print(f"Ollama API error: {response.status_code}")
+                print(f"Ollama API error: {status_code}")
                 return None
                 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"Connection error to Ollama: {e}")
             return None
+        except (GenerationQueueFull, CircuitOpenError) as e:
+            print(f"Ollama unavailable: {e}")
+            return None
+    
+    async def _post_generate(self, payload: Dict) -> Tuple[int, Dict]:
+        """POST /api/generate once the scheduler grants a slot, recording the outcome on the circuit breaker
+        (raises CircuitOpenError or GenerationQueueFull instead of calling a failing or overloaded Ollama)"""
+        if not self.ollama_breaker.allow_request():
+            self._schedule_probe()
+            raise CircuitOpenError(self.ollama_breaker.last_error or "circuit open")
+        
+        ticket = self.generation_scheduler.enter()
+        try:
+            await ticket.wait()
+            started = time.monotonic()
+            try:
+                status_code, data = await self.ollama_client.post(
+                    "/api/generate", payload, timeout=self._generation_timeout(payload["model"])
+                )
+            except httpx.HTTPError as e:
+                self.ollama_breaker.record_failure(e, time.monotonic() - started)
+                raise
+            if status_code == 200:
+                self.ollama_breaker.record_success(time.monotonic() - started)
+                self._record_model_use(payload["model"], data)
+            else:
+                self.ollama_breaker.record_failure(f"status {status_code}", time.monotonic() - started)
+            return status_code, data
+        finally:
+            ticket.release()
+    
+    def _ollama_payload(self, prompt: str, session_context: Optional[List[int]] = None) -> Dict:
+        """Ollama /api/generate payload for a plain prompt (generation and explanations)"""
+        payload = {
+            "model": self.ollama_model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.ollama_keep_alive,
+            "options": dict(self.ollama_options)
+        }
+        if session_context:
+            payload["context"] = session_context
+        return payload
     
     def _clean_ollama_generated_code(self, raw_code: str) -> str:
         """Clean and validate generated Skript code from Ollama"""
@@ -1271,7 +1874,7 @@ Remember: A happy duck writes organized code! 🦆✨"""
         
         return "\n".join(clean_lines).strip()
     
-    def _generate_ollama_explanation(self, prompt: str, code: str) -> str:
+    async def _generate_ollama_explanation(self, prompt: str, code: str) -> str:
         """Generate explanation for the Skript code using Ollama"""
         explanation_prompt = f"""Explain this Skript code in simple terms:
 
@@ -1282,17 +1885,15 @@ GENERATED CODE:
 
 Provide a brief explanation of what this code does and how it works in Skript."""
 
-        explanation = self._call_ollama_api(explanation_prompt)
+        explanation = await self._call_ollama_api(explanation_prompt)
         return explanation if explanation else "Code explanation unavailable"
     
-    def get_ollama_models(self) -> List[str]:
+    async def get_ollama_models(self) -> List[str]:
         """Get list of available Ollama models"""
         try:
-            url = f"{self.ollama_base_url}/api/tags"
-            response = requests.get(url, timeout=10)
+            status_code, data = await self.ollama_client.get("/api/tags", timeout=10)
             
-            if response.status_code == 200:
-                data = response.json()
+            if status_code == 200:
                 return [model["name"] for model in data.get("models", [])]
             else:
                 return ["codellama", "llama2", "mistral"]  # Fallback list
@@ -1301,20 +1902,92 @@ Provide a brief explanation of what this code does and how it works in Skript.""
             return ["codellama", "llama2", "mistral"]
     
     def switch_ollama_model(self, model_name: str) -> str:
-        """Switch to a different Ollama model"""
+        """Switch to a different Ollama model (and start loading it in the background)"""
         self.ollama_model = model_name
+        if self.ollama_enabled and not self.model_warmth.is_warm(model_name):
+            self._schedule_warm_up(model_name)
         return f"Switched to Ollama model: {model_name}"
     
     def get_ollama_status(self) -> Dict:
-        """Get Ollama service status"""
-        self._check_ollama_availability()
+        """Get Ollama service status from the cached health state (no calls to Ollama)"""
+        if self.ollama_breaker.refresh() != CircuitBreaker.CLOSED:
+            self._schedule_probe()
+        available = self.ollama_enabled and self.ollama_breaker.state == CircuitBreaker.CLOSED
         return {
-            "ollama_available": self.ollama_enabled,
+            "ollama_available": available,
+            "state": self.ollama_state,
             "current_model": self.ollama_model,
+            "model_state": self.model_warmth.state(self.ollama_model),
+            "keep_alive": self.ollama_keep_alive,
+            "models": self.model_warmth.status(),
             "base_url": self.ollama_base_url,
-            "available_models": self.get_ollama_models() if self.ollama_enabled else []
+            "available_models": list(self.ollama_health["models"]) if available else [],
+            "models_checked_at": self.ollama_health["checked_at"],
+            "circuit_breaker": self.ollama_breaker.status(),
+            "generation_cache": {
+                **self.generation_cache.stats(),
+                "in_flight": len(self.inflight_generations),
+                "coalesced": self.inflight_generations.coalesced
+            },
+            "generation_queue": self.generation_scheduler.status(),
+            "jobs": {**self.jobs.stats(), "pending": self.job_workers.pending},
+            "sessions": self.session_contexts.stats()
         }
     
+    def get_readiness(self) -> Dict:
+        """Readiness details: examples are loaded; Ollama may still be checking or pulling"""
+        readiness = {
+            "examples": len(self.examples),
+            "ollama": self.ollama_state,
+            "model_state": self.model_warmth.state(self.ollama_model),
+            "ollama_available": self.ollama_enabled and self.ollama_breaker.state == CircuitBreaker.CLOSED
+        }
+        if self.ollama_state == "pulling" and self.ollama_pull_progress:
+            readiness["pull_progress"] = self.ollama_pull_progress
+        return readiness
+    
+    def get_learning_stats(self) -> Dict:
+        """Learning statistics for both traditional AI and Ollama, from live counters"""
+        return {
+            "traditional_ai": {
+                "total_examples": len(self.examples),
+                "user_corrections": self.learning_stats.user_corrections,
+                "knowledge_patterns": len(self.knowledge.get("patterns", {})),
+                "best_practices": len(self.knowledge.get("best_practices", []))
+            },
+            "ollama_ai": {
+                "enabled": self.ollama_enabled,
+                "current_model": self.ollama_model,
+                **self.learning_stats.ollama_counts()
+            },
+            "feedback_data": self.learning_stats.feedback_counts()
+        }
+    
+    def get_learning_context(self) -> Dict:
+        """Newest feedback, Ollama learning entries and user corrections, from memory"""
+        return self.recent_activity.snapshot()
+    
+    def _load_learning_stats(self):
+        """Count stored examples, feedback and Ollama learning entries and fill the recent-activity buffers, once at startup"""
+        try:
+            self.learning_stats.rebuild(
+                self.examples,
+                self.storage.load_records("feedback"),
+                self.storage.load_records("ollama_learning_context", limit=self.ollama_context_limit)
+            )
+        except Exception as e:
+            print(f"Error loading learning stats: {e}")
+        
+        try:
+            size = self.recent_activity.size
+            self.recent_activity.rehydrate(
+                self.storage.load_records("feedback", limit=size),
+                self.storage.load_records("ollama_learning_context", limit=size),
+                [example for example in self.examples if example.get("source") == "user_correction"][-size:]
+            )
+        except Exception as e:
+            print(f"Error loading recent learning activity: {e}")
+    
     def learn_from_ollama_feedback(self, prompt: str, ollama_code: str, feedback: str, corrected_code: Optional[str] = None) -> str:
         """Learn from feedback on Ollama-generated code"""
         # Store the feedback for future Ollama context building
@@ -1327,18 +2000,9 @@ Provide a brief explanation of what this code does and how it works in Skript.""
             "source": "ollama_feedback"
         }
         
-        # Save to a special Ollama feedback file
-        feedback_path = "ollama_feedback.json"
+        # Save to a special Ollama feedback collection
         try:
-            feedbacks = []
-            if os.path.exists(feedback_path):
-                with open(feedback_path, "r", encoding="utf-8") as f:
-                    feedbacks = json.load(f)
-            
-            feedbacks.append(feedback_entry)
-            
-            with open(feedback_path, "w", encoding="utf-8") as f:
-                json.dump(feedbacks, f, indent=2, ensure_ascii=False)
+            self.storage.append_record("ollama_feedback", feedback_entry)
             
             # Also add corrected code as a new example if provided
             if corrected_code:
@@ -1520,21 +2184,10 @@ This code was partially correct but had some issues. Learn from this feedback fo
     def _add_to_ollama_context(self, training_example: Dict):
         """Add training example to Ollama's learning context"""
         try:
-            context_path = "ollama_learning_context.json"
-            context_data = []
-            
-            if os.path.exists(context_path):
-                with open(context_path, "r", encoding="utf-8") as f:
-                    context_data = json.load(f)
-            
-            context_data.append(training_example)
-            
             # Keep only the last 100 training examples to avoid huge files
-            if len(context_data) > 100:
-                context_data = context_data[-100:]
-            
-            with open(context_path, "w", encoding="utf-8") as f:
-                json.dump(context_data, f, indent=2, ensure_ascii=False)
+            self.storage.append_record("ollama_learning_context", training_example, keep=self.ollama_context_limit)
+            self.learning_stats.record_context(training_example)
+            self.recent_activity.record_context(training_example)
                 
         except Exception as e:
             print(f"Error adding to Ollama context: {e}")
@@ -1551,21 +2204,8 @@ This code was partially correct but had some issues. Learn from this feedback fo
                 "ollama_specific": feedback_entry["ollama_learning"]
             }
             
-            summary_path = "ollama_learning_summary.json"
-            summaries = []
-            
-            if os.path.exists(summary_path):
-                with open(summary_path, "r", encoding="utf-8") as f:
-                    summaries = json.load(f)
-            
-            summaries.append(learning_summary)
-            
             # Keep only the last 50 summaries
-            if len(summaries) > 50:
-                summaries = summaries[-50:]
-            
-            with open(summary_path, "w", encoding="utf-8") as f:
-                json.dump(summaries, f, indent=2, ensure_ascii=False)
+            self.storage.append_record("ollama_learning_summary", learning_summary, keep=50)
                 
         except Exception as e:
             print(f"Error updating Ollama learning context: {e}")
@@ -1599,23 +2239,20 @@ This code was partially correct but had some issues. Learn from this feedback fo
         if not relevant_examples:
             return "No directly relevant examples found, but use Skript best practices."
         
-        context_parts = []
-        
-        for i, example in enumerate(relevant_examples[:3], 1):
-            context_parts.append(f"EXAMPLE {i}:")
-            context_parts.append(f"User Request: {example.get('prompt', 'N/A')}")
-            context_parts.append(f"Working Code:\n{example.get('code', 'N/A')}")
-            context_parts.append(f"Usage Count: {example.get('usage_count', 0)} times")
-            context_parts.append("")
-        
-        context_parts.append("LEARN FROM THESE PATTERNS:")
-        context_parts.append("- Notice syntax structure and indentation")
-        context_parts.append("- Copy command/event formats that work")
-        context_parts.append("- Use similar variable names and logic flow")
-        context_parts.append("- Maintain consistent Skript syntax")
+        context_parts = [self._example_context_block(i, example) for i, example in enumerate(relevant_examples[:3], 1)]
+        context_parts.append(EXAMPLES_CONTEXT_FOOTER)
         
         return "\n".join(context_parts)
     
+    def _example_context_block(self, number: int, example: Dict) -> str:
+        return "\n".join([
+            f"EXAMPLE {number}:",
+            f"User Request: {example.get('prompt', 'N/A')}",
+            f"Working Code:\n{example.get('code', 'N/A')}",
+            f"Usage Count: {example.get('usage_count', 0)} times",
+            ""
+        ])
+    
     def _generate_hybrid_explanation(self, prompt: str, code: str, examples: List[Dict]) -> str:
         """Generate explanation for hybrid Ollama + examples generation"""
         explanation_parts = []
@@ -1672,24 +2309,19 @@ This code was partially correct but had some issues. Learn from this feedback fo
         
         return result
     
-    def _find_relevant_examples(self, prompt: str) -> List[Dict]:
-        """Find examples relevant to the prompt"""
+    def _find_relevant_examples(self, prompt: str, ranked: Optional[List[Tuple[int, float]]] = None) -> List[Dict]:
+        """Find examples relevant to the prompt (or take them from an existing ranking)"""
         relevant = []
-        prompt_words = set(prompt.lower().split())
-        
-        for example in self.examples:
-            example_words = set(example.get("prompt", "").lower().split())
-            
-            # Calculate word overlap
-            overlap = len(prompt_words.intersection(example_words))
-            if overlap > 0:
-                example["relevance_score"] = overlap
-                relevant.append(example)
         
-        # Sort by relevance and usage count
-        relevant.sort(key=lambda x: (x.get("relevance_score", 0), x.get("usage_count", 0)), reverse=True)
+        # Top 5 by BM25 relevance, then usage count
+        if ranked is None:
+            ranked = self._rank_example_ids(prompt, 5, by_usage=True)
+        for example_id, score in ranked:
+            example = self.examples[example_id]
+            example["relevance_score"] = round(score, 3)
+            relevant.append(example)
         
-        return relevant[:5]  # Return top 5 most relevant
+        return relevant
 
     # === FEEDBACK SYSTEM FOR CODELLAMA ===
     
@@ -1706,22 +2338,12 @@ This code was partially correct but had some issues. Learn from this feedback fo
                 "source": "codellama_feedback"
             }
             
-            # Save to dedicated CodeLlama feedback file
-            feedback_path = "codellama_feedback.json"
-            feedbacks = []
-            
-            if os.path.exists(feedback_path):
-                with open(feedback_path, "r", encoding="utf-8") as f:
-                    feedbacks = json.load(f)
-            
-            feedbacks.append(feedback_entry)
-            
-            # Keep only last 200 feedback entries to prevent huge files
-            if len(feedbacks) > 200:
-                feedbacks = feedbacks[-200:]
+            # Save to dedicated CodeLlama feedback collection, keeping only the last 200 entries
+            self.storage.append_record("codellama_feedback", feedback_entry, keep=200)
             
-            with open(feedback_path, "w", encoding="utf-8") as f:
-                json.dump(feedbacks, f, indent=2, ensure_ascii=False)
+            # Drop a cached answer that was reported as wrong
+            if feedback_type in ["negative", "correction"]:
+                self.generation_cache.invalidate(prompt=normalize_prompt(prompt), code=generated_code)
             
             # If positive feedback, reinforce the pattern
             if feedback_type == "positive":
@@ -1774,6 +2396,6 @@ if __name__ == "__main__":
 
     # Ask something similar
     request = AIRequest(prompt="when a player enters give them 1 diamond")
-    result = ai.generate_code(request)
+    result = asyncio.run(ai.generate_code(request))
     print(result.code)
     print(result.explanation)
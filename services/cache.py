@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class GenerationCache:
+    """LRU cache with a time-to-live for generated responses.
+
+    Keys are built by the caller from everything that determines the answer (the
+    normalized prompt, the ids of the examples given as context, the model and its
+    sampling options). Since examples are only ever appended, a change in which
+    examples are relevant to a prompt changes the key, so stale answers are never
+    served; they simply age out. Entries can also be dropped explicitly, by prompt
+    or by the code they contain, when feedback says an answer was wrong.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[Hashable, Tuple[float, str, Any]]" = OrderedDict()  # key -> (expires, prompt, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, prompt: str, value: Any):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, prompt, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, prompt: Optional[str] = None, code: Optional[str] = None) -> int:
+        """Drop entries cached for ``prompt`` or whose response code is ``code``; returns how many"""
+        with self.lock:
+            stale = [key for key, (_, cached_prompt, value) in self.entries.items()
+                     if (prompt is not None and cached_prompt == prompt)
+                     or (code is not None and getattr(value, "code", None) == code)]
+            for key in stale:
+                del self.entries[key]
+            return len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+class SingleFlight:
+    """Coalesces concurrent identical async calls into one.
+
+    The first caller for a key starts ``fn()`` as a task; callers arriving with the
+    same key while it runs await that same task instead of starting their own. The
+    task is shielded, so a caller that goes away (client disconnect) does not cancel
+    the call for everyone else. Must be used from a single event loop.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercased prompt with whitespace collapsed, so trivially different spellings share a cache entry"""
+    return " ".join(prompt.lower().split())
+
+
+def options_fingerprint(options: Dict) -> Tuple:
+    """Hashable form of a sampling options dict"""
+    return tuple(sorted(options.items()))
+
+
+def cache_key(prompt: str, example_ids: Iterable[int], model: str, options: Dict, *extra: Hashable) -> Tuple:
+    return (normalize_prompt(prompt), tuple(example_ids), model, options_fingerprint(options)) + extra
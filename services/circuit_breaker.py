@@ -0,0 +1,113 @@
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Ollama while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Remembers how recent Ollama calls went and stops sending calls to a failing server.
+
+    - closed: calls go through; each outcome and its latency is recorded. The breaker
+      opens after ``failure_threshold`` consecutive failures, or when at least half of
+      the last ``window`` calls failed (once there are ``min_calls`` of them).
+    - open: calls are refused (the caller falls back to the examples) until
+      ``reset_timeout`` seconds have passed.
+    - half_open: calls are still refused, but a probe is due; the owner runs one in
+      the background and reports it with ``record_success``/``record_failure``. A
+      success closes the breaker, a failure opens it again for twice as long (up to
+      ``max_reset_timeout``).
+
+    Used from the event loop only, so no locking.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0, max_reset_timeout: float = 300.0,
+                 window: int = 20, min_calls: int = 5):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.min_calls = min_calls
+        self.state = self.CLOSED
+        self.outcomes: Deque[Tuple[bool, Optional[float]]] = deque(maxlen=window)  # (succeeded, latency)
+        self.consecutive_failures = 0
+        self.open_timeout = reset_timeout
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+        self.last_failure_at: Optional[float] = None
+        self.short_circuited = 0
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to Ollama now; counts refused calls"""
+        if self.refresh() == self.CLOSED:
+            return True
+        self.short_circuited += 1
+        return False
+
+    def refresh(self) -> str:
+        """Move from open to half-open once the timeout has passed; returns the state"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.open_timeout:
+            self.state = self.HALF_OPEN
+        return self.state
+
+    @property
+    def probe_due(self) -> bool:
+        return self.state == self.HALF_OPEN
+
+    def record_success(self, latency: Optional[float] = None):
+        self.outcomes.append((True, latency))
+        self.consecutive_failures = 0
+        self.last_success_at = time.time()
+        if self.state != self.CLOSED:
+            self.state = self.CLOSED
+            self.open_timeout = self.reset_timeout
+            self.opened_at = None
+
+    def record_failure(self, error: object, latency: Optional[float] = None):
+        self.outcomes.append((False, latency))
+        self.consecutive_failures += 1
+        self.last_error = str(error) or error.__class__.__name__
+        self.last_failure_at = time.time()
+        if self.state == self.HALF_OPEN:
+            self._open(min(self.open_timeout * 2, self.max_reset_timeout))
+        elif self.state == self.CLOSED and (self.consecutive_failures >= self.failure_threshold
+                                            or self._failure_rate() >= 0.5 and len(self.outcomes) >= self.min_calls):
+            self._open(self.reset_timeout)
+
+    def trip(self, error: object):
+        """Open right away (e.g. Ollama unreachable at startup)"""
+        self.record_failure(error)
+        if self.state == self.CLOSED:
+            self._open(self.reset_timeout)
+
+    def _open(self, timeout: float):
+        self.state = self.OPEN
+        self.open_timeout = timeout
+        self.opened_at = time.monotonic()
+
+    def _failure_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for succeeded, _ in self.outcomes if not succeeded) / len(self.outcomes)
+
+    def status(self) -> Dict:
+        latencies = [latency for succeeded, latency in self.outcomes if succeeded and latency is not None]
+        retry_in = None
+        if self.state == self.OPEN:
+            retry_in = round(max(0.0, self.open_timeout - (time.monotonic() - self.opened_at)), 1)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "recent_calls": len(self.outcomes),
+            "recent_failure_rate": round(self._failure_rate(), 2),
+            "average_latency_seconds": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+            "last_failure_at": self.last_failure_at,
+            "retry_in_seconds": retry_in,
+            "short_circuited": self.short_circuited
+        }
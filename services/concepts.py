@@ -0,0 +1,166 @@
+import hashlib
+import json
+import re
+from typing import Dict, Iterable, List, Set
+
+# Default keyword tables. knowledge_base.json can override any of them under "concept_lexicon".
+# Keywords match as substrings of the lowercased text, like the original `word in text` checks.
+DEFAULT_CONCEPT_LEXICON = {
+    # Concepts detected in user prompts
+    "prompt_concepts": {
+        # Events
+        "join_event": ["join", "connect", "enter"],
+        "death_event": ["death", "die", "dies", "kill"],
+        "break_event": ["break", "destroy"],
+        "place_event": ["place", "put"],
+        # Actions
+        "give_action": ["give", "receive", "get"],
+        "kick_action": ["kick", "remove"],
+        "ban_action": ["ban", "block"],
+        "heal_action": ["heal", "restore"],
+        "teleport_action": ["teleport", "tp", "move"],
+        "fly_action": ["fly", "flight"],
+        "message_action": ["send", "message", "tell"],
+        # Entities
+        "player_entity": ["player", "user"],
+        "mob_entity": ["mob", "monster", "zombie", "skeleton", "creeper"],
+        # Items
+        "item_concept": ["diamond", "emerald", "gold", "iron", "item"],
+        # Code structures
+        "command_structure": ["command", "cmd"],
+        "function_structure": ["function", "func"],
+        "event_structure": ["event", "on", "when"]
+    },
+    # Actions detected in Skript code
+    "code_actions": {
+        "give": ["give"],
+        "kick": ["kick"],
+        "ban": ["ban"],
+        "heal": ["heal"],
+        "teleport": ["teleport"],
+        "send": ["send"]
+    },
+    # Other code properties
+    "code_flags": {
+        "has_permissions": ["permission"],
+        "has_conditions": ["if", "else", "while"]
+    },
+    # Feedback error types, in priority order (the first one found wins)
+    "feedback_errors": {
+        "command_structure": ["wrong command", "incorrect syntax", "bad structure"],
+        "wrong_action": ["wrong action", "doesn't do", "should", "instead"],
+        "permission_issue": ["permission", "op", "access"],
+        "parameter_issue": ["parameter", "argument", "missing", "arg"],
+        "item_mismatch": ["item", "diamond", "emerald", "gold", "iron"],
+        "event_mismatch": ["event", "trigger", "when", "on"]
+    },
+    # Terms compared between prompt, generated code and corrected code in feedback analysis
+    "feedback_targets": {
+        "kick": ["kick"],
+        "ban": ["ban"],
+        "give": ["give"],
+        "heal": ["heal"],
+        "teleport": ["teleport"],
+        "fly": ["fly"],
+        "diamond": ["diamond"],
+        "emerald": ["emerald"],
+        "gold ingot": ["gold ingot"],
+        "iron ingot": ["iron ingot"],
+        "join": ["join"],
+        "death": ["death"],
+        "break": ["break"],
+        "place": ["place"],
+        "player": ["player"],
+        "on join": ["on join"],
+        "on death": ["on death"],
+        "on break": ["on break"],
+        "on place": ["on place"],
+        "permission": ["permission"],
+        "command /": ["command /"],
+        "<player>": ["<player>"]
+    }
+}
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Build a regex that matches the longest keyword at a position, sharing common prefixes"""
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        is_end = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if is_end else group
+
+    return build(trie)
+
+
+class ConceptLexicon:
+    """Keyword table compiled into one automaton that maps text to labels in a single pass.
+
+    Every position of the text is tried against a trie-shaped regex inside a lookahead,
+    so overlapping keywords are all found. A match also yields the labels of any keyword
+    that is a prefix of it, since those match at the same position.
+    """
+
+    def __init__(self, table: Dict[str, List[str]]):
+        self.labels: List[str] = list(table)
+        keyword_labels: Dict[str, Set[str]] = {}
+        for label, keywords in table.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if keyword:
+                    keyword_labels.setdefault(keyword, set()).add(label)
+
+        self.keyword_labels: Dict[str, Set[str]] = {}
+        for keyword in keyword_labels:
+            labels = set()
+            for other, other_labels in keyword_labels.items():
+                if keyword.startswith(other):
+                    labels |= other_labels
+            self.keyword_labels[keyword] = labels
+
+        self.pattern = re.compile("(?=(" + _trie_pattern(keyword_labels) + "))") if keyword_labels else None
+
+    def extract(self, text: str) -> Set[str]:
+        """Labels whose keywords appear anywhere in the text"""
+        found: Set[str] = set()
+        if self.pattern is None or not text:
+            return found
+        for match in self.pattern.finditer(text.lower()):
+            found |= self.keyword_labels[match.group(1)]
+        return found
+
+    def ordered(self, labels: Set[str]) -> List[str]:
+        """Labels in table order"""
+        return [label for label in self.labels if label in labels]
+
+
+class ConceptExtractor:
+    """Compiled lexicons for prompts, code and feedback, built from a (partial) lexicon config"""
+
+    def __init__(self, config: Dict = None):
+        tables = {name: dict(table) for name, table in DEFAULT_CONCEPT_LEXICON.items()}
+        for name, table in (config or {}).items():
+            if name in tables and isinstance(table, dict):
+                tables[name] = table
+        self.tables = tables
+
+        self.prompt = ConceptLexicon(tables["prompt_concepts"])
+        self.code_actions = list(tables["code_actions"])
+        self.code = ConceptLexicon({**tables["code_actions"], **tables["code_flags"]})
+        self.feedback_errors = ConceptLexicon(tables["feedback_errors"])
+        self.feedback_targets = ConceptLexicon(tables["feedback_targets"])
+
+        # Changes whenever the tables that feed stored example features change
+        digest_source = json.dumps([tables["prompt_concepts"], tables["code_actions"], tables["code_flags"]], sort_keys=True)
+        self.fingerprint = hashlib.sha1(digest_source.encode("utf-8")).hexdigest()[:12]
@@ -0,0 +1,76 @@
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from services.similarity import LSHIndex, MinHasher
+
+
+def normalized_lines(code: str) -> FrozenSet[str]:
+    """Set of stripped, lowercased non-empty lines used to compare code snippets"""
+    return frozenset(line.strip().lower() for line in code.split('\n') if line.strip())
+
+
+def line_similarity(lines1: FrozenSet[str], lines2: FrozenSet[str]) -> float:
+    """Jaccard similarity of two normalized line sets"""
+    if not lines1 or not lines2:
+        return 0.0
+    total_lines = len(lines1 | lines2)
+    return len(lines1 & lines2) / total_lines if total_lines > 0 else 0.0
+
+
+class ErrorPatternIndex:
+    """Known error patterns held in memory, indexed by the concepts they apply to.
+
+    Each pattern's ``incorrect_approach.code_snippet`` is normalized to a line set once,
+    when the index is built, so checking proposed code never touches the disk. Snippets
+    also get a MinHash signature (stored on the pattern as ``minhash``) in an LSH index,
+    so only snippets likely to resemble the proposed code are compared exactly.
+    """
+
+    def __init__(self, patterns: Optional[List[Dict]] = None, minhasher: Optional[MinHasher] = None):
+        self.minhasher = minhasher or MinHasher()
+        self.patterns: List[Dict] = []
+        self.pattern_lines: List[FrozenSet[str]] = []
+        self.by_concept: Dict[str, Set[int]] = {}
+        self.lsh = LSHIndex()
+        self.rebuild(patterns or [])
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def rebuild(self, patterns: List[Dict]):
+        """Re-index the full pattern list (called after every write)"""
+        self.patterns = patterns
+        self.pattern_lines = []
+        self.by_concept = {}
+        self.lsh.clear()
+        for pattern_id, pattern in enumerate(patterns):
+            lines = normalized_lines(pattern["incorrect_approach"]["code_snippet"])
+            self.pattern_lines.append(lines)
+            if len(pattern.get("minhash") or []) != self.minhasher.num_perm:
+                pattern["minhash"] = self.minhasher.signature(lines)
+            self.lsh.add(pattern_id, pattern["minhash"])
+            for concept in pattern.get("avoid_when", []):
+                self.by_concept.setdefault(concept, set()).add(pattern_id)
+
+    def candidates(self, concepts: Iterable[str], min_overlap: int) -> List[int]:
+        """Ids of patterns sharing at least ``min_overlap`` concepts, in stored order"""
+        overlap: Dict[int, int] = {}
+        for concept in set(concepts):
+            for pattern_id in self.by_concept.get(concept, ()):
+                overlap[pattern_id] = overlap.get(pattern_id, 0) + 1
+        return sorted(pattern_id for pattern_id, count in overlap.items() if count >= min_overlap)
+
+    def match(self, concepts: Iterable[str], code: str, min_overlap: int = 2,
+              min_similarity: float = 0.6) -> Optional[Tuple[Dict, float]]:
+        """First (pattern, similarity) whose concepts overlap and whose snippet resembles the code"""
+        code_lines = normalized_lines(code)
+        similar_ids = self.lsh.query(self.minhasher.signature(code_lines))
+        if not similar_ids:
+            return None
+
+        for pattern_id in self.candidates(concepts, min_overlap):
+            if pattern_id not in similar_ids:
+                continue
+            similarity = line_similarity(code_lines, self.pattern_lines[pattern_id])
+            if similarity > min_similarity:
+                return self.patterns[pattern_id], similarity
+        return None
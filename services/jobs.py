@@ -0,0 +1,190 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+class Job:
+    """One generation running in the background; ``status`` is queued, running, done or failed"""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.result: Optional[Any] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+        self.finished: Optional[float] = None  # monotonic, for expiry
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobStore:
+    """Background jobs by id.
+
+    Finished jobs are kept for ``ttl_seconds`` so clients can collect the result, and
+    at most ``max_jobs`` are kept overall (oldest finished ones go first). Expiry
+    happens whenever a job is created or looked up. Used from the event loop only.
+    """
+
+    def __init__(self, ttl_seconds: float = 600.0, max_jobs: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    def create(self, kind: str) -> Job:
+        self._expire()
+        job = Job(kind)
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self.jobs.get(job_id)
+
+    def finish(self, job: Job, result: Any):
+        job.status = "done"
+        job.result = result
+        self._mark_finished(job)
+
+    def fail(self, job: Job, error: object):
+        job.status = "failed"
+        job.error = str(error) or error.__class__.__name__
+        self._mark_finished(job)
+
+    def track(self, kind: str, task: "asyncio.Future", convert: Callable[[Any], Any] = lambda result: result) -> Job:
+        """A running job whose result is ``convert(task.result())`` once ``task`` completes"""
+        job = self.create(kind)
+        job.status = "running"
+
+        def on_done(finished: "asyncio.Future"):
+            try:
+                self.finish(job, convert(finished.result()))
+            except BaseException as e:  # includes cancellation
+                self.fail(job, e)
+
+        task.add_done_callback(on_done)
+        return job
+
+    def _mark_finished(self, job: Job):
+        job.finished_at = datetime.now().isoformat()
+        job.finished = time.monotonic()
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished is not None and now - job.finished > self.ttl_seconds]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if len(self.jobs) >= self.max_jobs:
+            for job_id in [job_id for job_id, job in self.jobs.items() if job.done][:len(self.jobs) - self.max_jobs + 1]:
+                del self.jobs[job_id]
+
+    def stats(self) -> Dict[str, int]:
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return counts
+
+
+class JobQueueFull(Exception):
+    """Raised when no more jobs can be queued"""
+
+
+class JobWorkers:
+    """A fixed pool of worker tasks consuming a bounded queue of jobs.
+
+    ``submit`` records a queued job in the store and returns it right away; a worker
+    later runs ``handler(payload)`` and stores its result (or error). ``on_finished(job,
+    payload)``, if given, then runs as a separate task limited to ``notify_timeout``
+    seconds, so a slow webhook never holds up the next job. Workers are started on
+    the running loop by the first ``submit`` and stopped by ``stop``.
+    """
+
+    def __init__(self, store: JobStore, handler: Callable[[Any], Awaitable[Any]], workers: int = 2,
+                 max_pending: int = 100, on_finished: Optional[Callable[[Job, Any], Awaitable[None]]] = None,
+                 notify_timeout: float = 5.0):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.on_finished = on_finished
+        self.notify_timeout = notify_timeout
+        self.queue: Optional["asyncio.Queue[Tuple[Job, Any]]"] = None
+        self.tasks: List[asyncio.Task] = []
+        self.notifications: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def submit(self, kind: str, payload: Any) -> Job:
+        self._start()
+        if self.queue.full():
+            raise JobQueueFull(f"{self.queue.qsize()} jobs already waiting")
+        job = self.store.create(kind)
+        self.queue.put_nowait((job, payload))
+        return job
+
+    def _start(self):
+        if self.queue is None or not self.tasks or self.tasks[0].get_loop() is not asyncio.get_running_loop():
+            self.queue = asyncio.Queue(maxsize=self.max_pending)
+            self.tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def _work(self):
+        while True:
+            job, payload = await self.queue.get()
+            job.status = "running"
+            try:
+                self.store.finish(job, await self.handler(payload))
+            except asyncio.CancelledError:
+                self.store.fail(job, "cancelled")
+                raise
+            except Exception as e:
+                self.store.fail(job, e)
+            finally:
+                self.queue.task_done()
+            if self.on_finished is not None:
+                notification = asyncio.ensure_future(self._notify(job, payload))
+                self.notifications.add(notification)
+                notification.add_done_callback(self.notifications.discard)
+
+    async def _notify(self, job: Job, payload: Any):
+        try:
+            await asyncio.wait_for(self.on_finished(job, payload), timeout=self.notify_timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Job {job.id} finished, but notifying took longer than {self.notify_timeout:g}s")
+        except Exception as e:
+            print(f"⚠️ Job {job.id} finished, but notifying failed: {e}")
+
+    async def stop(self):
+        """Cancel the workers and pending notifications; jobs still queued or running are marked failed"""
+        tasks = [task for task in list(self.tasks) + list(self.notifications)
+                 if task.get_loop() is asyncio.get_running_loop()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.queue is not None:
+            while not self.queue.empty():
+                job, _ = self.queue.get_nowait()
+                self.store.fail(job, "cancelled")
+        self.tasks = []
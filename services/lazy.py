@@ -0,0 +1,33 @@
+import threading
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyService(Generic[T]):
+    """Stands in for a service that is expensive to construct.
+
+    Nothing is built at import time; the instance is created by the first ``get()``
+    or attribute access (from any thread, exactly once) and every attribute access
+    is then forwarded to it. The app's startup hook calls ``get()`` in a worker
+    thread so the data is usually loaded before the first request needs it.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
@@ -0,0 +1,67 @@
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+
+class OllamaClient:
+    """Async HTTP client for the Ollama API with a persistent connection pool.
+
+    One ``httpx.AsyncClient`` is shared by every call, so generations reuse open
+    connections instead of reconnecting each time, and waiting on Ollama never
+    blocks the event loop. Every call takes its own timeout. The pool is created
+    lazily on the running loop (and recreated if the loop changes, e.g. in scripts
+    that call ``asyncio.run`` more than once).
+    """
+
+    def __init__(self, base_url: str, max_connections: int = 10, max_keepalive: int = 5):
+        self.base_url = base_url.rstrip("/")
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(base_url=self.base_url, limits=self.limits)
+            self._loop = loop
+        return self._client
+
+    async def get(self, path: str, timeout: float) -> Tuple[int, Dict]:
+        """GET an API path; returns (status code, JSON body or {})"""
+        response = await self._get_client().get(path, timeout=timeout)
+        return response.status_code, self._json(response)
+
+    async def post(self, path: str, payload: Dict, timeout: float) -> Tuple[int, Dict]:
+        """POST JSON to an API path; returns (status code, JSON body or {})"""
+        response = await self._get_client().post(path, json=payload, timeout=timeout)
+        return response.status_code, self._json(response)
+
+    async def stream(self, path: str, payload: Dict, timeout: float) -> AsyncIterator[Dict]:
+        """POST JSON and yield each object of the newline-delimited JSON response as it arrives.
+
+        ``timeout`` applies to connecting and to each read, so it bounds the wait for
+        the first token and every gap between tokens, not the whole generation.
+        """
+        async with self._get_client().stream("POST", path, json=payload, timeout=timeout) as response:
+            if response.status_code != 200:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+    @staticmethod
+    def _json(response: httpx.Response) -> Dict:
+        if response.status_code != 200:
+            return {}
+        try:
+            return response.json()
+        except ValueError:
+            return {}
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
@@ -0,0 +1,98 @@
+import math
+from typing import Any, Dict, List, Optional
+
+# Llama tokenizers average roughly 3-4 characters per token on English and code;
+# erring low keeps the estimate on the safe side of the context window.
+CHARS_PER_TOKEN = 3.2
+
+# Relevance is weighted by kind: examples count most, then feedback notes, then knowledge patterns
+KIND_WEIGHTS = {"example": 1.0, "feedback": 0.9, "pattern": 0.8}
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def prompt_overlap(prompt_words: set, text: str) -> float:
+    """Share of the prompt's words that appear in ``text`` (0..1)"""
+    if not prompt_words:
+        return 0.0
+    return len(prompt_words & set(text.lower().split())) / len(prompt_words)
+
+
+class PromptPiece:
+    """One optional block of context: an example, a knowledge pattern or a feedback note"""
+
+    def __init__(self, kind: str, label: str, text: str, relevance: float, source: Any = None):
+        self.kind = kind
+        self.label = label
+        self.text = text
+        self.relevance = relevance
+        self.source = source  # what the text was made from, e.g. the example dict
+        self.tokens = estimate_tokens(text)
+
+
+class PromptBudget:
+    """Packs context pieces into what is left of the model's context window.
+
+    The window (``num_ctx``) has to hold the fixed instructions, the context and the
+    answer (``num_predict``). Pieces are taken by relevance, weighted by kind, as long
+    as they fit; anything else is dropped instead of letting Ollama silently cut the
+    start of the prompt. ``summary()`` describes what went in and what didn't.
+    """
+
+    def __init__(self, num_ctx: int, num_predict: int, margin: int = 32):
+        self.num_ctx = num_ctx
+        self.num_predict = num_predict
+        self.margin = margin
+        self.included: List[PromptPiece] = []
+        self.dropped: List[PromptPiece] = []
+        self.used_tokens = 0
+
+    def pack(self, template: str, pieces: List[PromptPiece], limits: Optional[Dict[str, int]] = None) -> List[PromptPiece]:
+        """Choose pieces for ``template`` (the prompt without them); returns them in their original order.
+
+        ``limits`` caps how many pieces of a kind are used, e.g. ``{"example": 3}``.
+        """
+        limits = limits or {}
+        self.used_tokens = estimate_tokens(template)
+        available = self.num_ctx - self.num_predict - self.margin - self.used_tokens
+        taken: Dict[str, int] = {}
+        chosen = set()
+        self.dropped = []
+
+        order = sorted(range(len(pieces)), key=lambda i: (-pieces[i].relevance * KIND_WEIGHTS.get(pieces[i].kind, 1.0), i))
+        for i in order:
+            piece = pieces[i]
+            if piece.tokens > available or taken.get(piece.kind, 0) >= limits.get(piece.kind, len(pieces)):
+                self.dropped.append(piece)
+                continue
+            chosen.add(i)
+            available -= piece.tokens
+            self.used_tokens += piece.tokens
+            taken[piece.kind] = taken.get(piece.kind, 0) + 1
+
+        self.included = [pieces[i] for i in sorted(chosen)]
+        return self.included
+
+    @property
+    def budget_tokens(self) -> int:
+        return self.num_ctx - self.num_predict
+
+    def counts(self, kind: str) -> str:
+        included = sum(1 for piece in self.included if piece.kind == kind)
+        total = included + sum(1 for piece in self.dropped if piece.kind == kind)
+        return f"{included}/{total}" if total != included else str(included)
+
+    def summary(self) -> str:
+        """e.g. ``3/5 examples, 1 pattern, ~1350/1748 prompt tokens (dropped: example 'vip kit')``"""
+        parts = []
+        for kind in ("example", "pattern", "feedback"):
+            if any(piece.kind == kind for piece in self.included + self.dropped):
+                count = self.counts(kind)
+                parts.append(f"{count} {kind}{'' if count == '1' else 's'}")
+        parts.append(f"~{self.used_tokens}/{self.budget_tokens} prompt tokens")
+        text = ", ".join(parts)
+        if self.dropped:
+            text += " (dropped: " + ", ".join(f"{piece.kind} '{piece.label[:40]}'" for piece in self.dropped) + ")"
+        return text
@@ -0,0 +1,278 @@
+import heapq
+import math
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens, the same way prompts are compared"""
+    return text.lower().split()
+
+
+class ExampleIndex:
+    """In-memory inverted index from prompt tokens to example ids.
+
+    Example ids are positions in ``SkDuckyAIService.examples``. Examples are only
+    ever appended to that list, so a position stays valid for the life of the index.
+    Per-example term frequencies and lengths are kept for the BM25 ranker.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = {}
+        self.doc_terms: Dict[int, Counter] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+        self.version = 0  # bumped on every change, lets derived structures detect staleness
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    @property
+    def average_length(self) -> float:
+        return self.total_length / len(self.doc_terms) if self.doc_terms else 0.0
+
+    def add(self, example_id: int, text: str):
+        """Index (or re-index) one example"""
+        if example_id in self.doc_terms:
+            self.remove(example_id)
+
+        tokens = tokenize(text)
+        terms = Counter(tokens)
+        self.doc_terms[example_id] = terms
+        self.doc_lengths[example_id] = len(tokens)
+        self.total_length += len(tokens)
+        self.version += 1
+        for token in terms:
+            self.postings.setdefault(token, set()).add(example_id)
+
+    def remove(self, example_id: int):
+        """Drop an example from the index"""
+        terms = self.doc_terms.pop(example_id, Counter())
+        self.total_length -= self.doc_lengths.pop(example_id, 0)
+        self.version += 1
+        for token in terms:
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(example_id)
+            if not ids:
+                del self.postings[token]
+
+    def rebuild(self, examples: List[Dict]):
+        """Re-index a whole example list from scratch"""
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+        self.version += 1
+        for example_id, example in enumerate(examples):
+            self.add(example_id, example.get("prompt", ""))
+
+    def document_frequency(self, token: str) -> int:
+        return len(self.postings.get(token, ()))
+
+    def candidates(self, tokens: Iterable[str]) -> List[int]:
+        """Ids of examples sharing at least one token, in insertion order"""
+        found: Set[int] = set()
+        for token in tokens:
+            found.update(self.postings.get(token, ()))
+        return sorted(found)
+
+
+class BM25Ranker:
+    """Okapi BM25 scoring over an ``ExampleIndex``.
+
+    Document frequencies and term vectors live in the index, so scoring a query
+    only touches the postings of its own tokens.
+    """
+
+    def __init__(self, index: ExampleIndex, k1: float = 1.5, b: float = 0.75):
+        self.index = index
+        self.k1 = k1
+        self.b = b
+
+    def idf(self, token: str) -> float:
+        total = len(self.index)
+        df = self.index.document_frequency(token)
+        return math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+    def score(self, tokens: Iterable[str]) -> Dict[int, float]:
+        """BM25 score of every example sharing a token with the query"""
+        scores: Dict[int, float] = {}
+        average_length = self.index.average_length or 1.0
+
+        for token in set(tokens):
+            ids = self.index.postings.get(token)
+            if not ids:
+                continue
+            idf = self.idf(token)
+            for example_id in ids:
+                tf = self.index.doc_terms[example_id][token]
+                length_norm = 1 - self.b + self.b * self.index.doc_lengths[example_id] / average_length
+                weight = idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+                scores[example_id] = scores.get(example_id, 0.0) + weight
+
+        return dict(sorted(scores.items()))
+
+    def normalizer(self, tokens: Iterable[str]) -> float:
+        """Score of an average-length example containing each query token once"""
+        return sum(self.idf(token) for token in set(tokens))
+
+    def normalized_scores(self, tokens: Iterable[str]) -> Dict[int, float]:
+        """BM25 scores scaled to roughly 0..1 so they can be used as relevance"""
+        tokens = list(tokens)
+        scores = self.score(tokens)
+        norm = self.normalizer(tokens)
+        if norm <= 0:
+            return {example_id: 0.0 for example_id in scores}
+        return {example_id: min(value / norm, 1.0) for example_id, value in scores.items()}
+
+    def ranked(self, tokens: Iterable[str], normalized: bool = True) -> List[Tuple[int, float]]:
+        """Every example with a positive score, best first, ties in insertion order"""
+        scores = self.normalized_scores(tokens) if normalized else self.score(tokens)
+        return sorted(((example_id, score) for example_id, score in scores.items() if score > 0),
+                      key=lambda item: (-item[1], item[0]))
+
+    def top_k(self, tokens: Iterable[str], k: int, normalized: bool = True,
+              tiebreak: Optional[Callable[[int], float]] = None) -> List[Tuple[int, float]]:
+        """Best ``k`` (example_id, score) pairs, selected with a heap"""
+        scores = self.normalized_scores(tokens) if normalized else self.score(tokens)
+        if tiebreak is None:
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], tiebreak(item[0])))
+
+
+class ExampleMatrix:
+    """NumPy view of the example store for scoring every example at once.
+
+    BM25 weights are kept as a sparse term x example matrix (one id/weight array per
+    term), so a prompt is scored with a single sparse matrix-vector product, and a
+    batch of prompts with a single sparse matrix-matrix product. Concepts, structure
+    types and code actions are dense 0/1 matrices over the precomputed example features.
+    Everything is rebuilt lazily when the index version changes.
+    """
+
+    STRUCTURE_TYPES = ["command", "event", "function"]
+
+    def __init__(self, ranker: BM25Ranker):
+        if np is None:
+            raise ImportError("numpy is required for vectorized example scoring")
+        self.ranker = ranker
+        self.index = ranker.index
+        self.version = None
+        self.size = 0
+        self.term_columns: Dict[str, Tuple["np.ndarray", "np.ndarray"]] = {}
+        self.concept_labels: List[str] = []
+        self.action_labels: List[str] = []
+        self.concepts = None
+        self.concept_counts = None
+        self.structure_types = None
+        self.actions = None
+
+    def refresh(self, examples: List[Dict], concept_labels: Sequence[str], action_labels: Sequence[str]):
+        """Rebuild the matrices if the index changed since the last build"""
+        if (self.version == self.index.version and self.size == len(examples)
+                and self.concept_labels == list(concept_labels) and self.action_labels == list(action_labels)):
+            return
+
+        self.size = len(examples)
+        average_length = self.index.average_length or 1.0
+        k1, b = self.ranker.k1, self.ranker.b
+
+        self.term_columns = {}
+        for token, ids in self.index.postings.items():
+            doc_ids = np.fromiter(sorted(ids), dtype=np.int64, count=len(ids))
+            tf = np.array([self.index.doc_terms[i][token] for i in doc_ids], dtype=np.float64)
+            lengths = np.array([self.index.doc_lengths[i] for i in doc_ids], dtype=np.float64)
+            length_norm = 1 - b + b * lengths / average_length
+            weights = self.ranker.idf(token) * tf * (k1 + 1) / (tf + k1 * length_norm)
+            self.term_columns[token] = (doc_ids, weights)
+
+        self.concept_labels = list(concept_labels)
+        self.action_labels = list(action_labels)
+        concept_pos = {label: i for i, label in enumerate(self.concept_labels)}
+        action_pos = {label: i for i, label in enumerate(self.action_labels)}
+
+        self.concepts = np.zeros((self.size, len(self.concept_labels)), dtype=np.float64)
+        self.actions = np.zeros((self.size, len(self.action_labels)), dtype=np.float64)
+        self.structure_types = np.full(self.size, -1, dtype=np.int64)
+        for row, example in enumerate(examples):
+            features = example.get("features") or {}
+            for concept in features.get("concepts", []):
+                if concept in concept_pos:
+                    self.concepts[row, concept_pos[concept]] = 1.0
+            structure = features.get("structure") or {}
+            for action in structure.get("actions", []):
+                if action in action_pos:
+                    self.actions[row, action_pos[action]] = 1.0
+            if structure.get("type") in self.STRUCTURE_TYPES:
+                self.structure_types[row] = self.STRUCTURE_TYPES.index(structure["type"])
+        self.concept_counts = self.concepts.sum(axis=1)
+
+        self.version = self.index.version
+
+    def bm25(self, tokens: Iterable[str]) -> "np.ndarray":
+        """BM25 score of every example for one prompt"""
+        return self.bm25_batch([tokens])[0]
+
+    def bm25_batch(self, token_lists: Sequence[Iterable[str]]) -> "np.ndarray":
+        """BM25 scores (prompts x examples) for a batch of prompts"""
+        rows, cols, weights = [], [], []
+        for row, tokens in enumerate(token_lists):
+            for token in set(tokens):
+                column = self.term_columns.get(token)
+                if column is None:
+                    continue
+                doc_ids, doc_weights = column
+                rows.append(np.full(len(doc_ids), row, dtype=np.int64))
+                cols.append(doc_ids)
+                weights.append(doc_weights)
+
+        count = len(token_lists)
+        if not rows:
+            return np.zeros((count, self.size))
+        flat = np.concatenate(rows) * self.size + np.concatenate(cols)
+        scores = np.bincount(flat, weights=np.concatenate(weights), minlength=count * self.size)
+        return scores.reshape(count, self.size)
+
+    def normalized_bm25_batch(self, token_lists: Sequence[Iterable[str]]) -> "np.ndarray":
+        """BM25 scores scaled like ``BM25Ranker.normalized_scores``"""
+        token_lists = [list(tokens) for tokens in token_lists]
+        scores = self.bm25_batch(token_lists)
+        norms = np.array([self.ranker.normalizer(tokens) for tokens in token_lists], dtype=np.float64)
+        safe = np.where(norms > 0, norms, 1.0)
+        return np.minimum(scores / safe[:, None], 1.0) * (norms > 0)[:, None]
+
+    def concept_vector(self, concepts: Iterable[str]) -> "np.ndarray":
+        """0/1 vector over the concept labels"""
+        vector = np.zeros(len(self.concept_labels))
+        for i, label in enumerate(self.concept_labels):
+            if label in concepts:
+                vector[i] = 1.0
+        return vector
+
+    def action_vector(self, actions: Iterable[str]) -> "np.ndarray":
+        """0/1 vector over the code action labels"""
+        vector = np.zeros(len(self.action_labels))
+        for i, label in enumerate(self.action_labels):
+            if label in actions:
+                vector[i] = 1.0
+        return vector
+
+
+def top_k_indices(scores: "np.ndarray", k: int, tiebreak: Optional[Callable[[int], float]] = None) -> List[int]:
+    """Indices of the k best positive scores, best first, ties broken by ``tiebreak`` then position"""
+    positive = np.flatnonzero(scores > 0)
+    if not len(positive) or k <= 0:
+        return []
+    if len(positive) > k:
+        # Keep everything tied with the k-th best so the tiebreak can still decide
+        kth = np.partition(scores[positive], len(positive) - k)[len(positive) - k]
+        positive = positive[scores[positive] >= kth]
+    ranked = sorted(positive.tolist(), key=lambda i: (-scores[i], -(tiebreak(i) if tiebreak else 0), i))
+    return ranked[:k]
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class GenerationQueueFull(Exception):
+    """Raised when a generation would wait longer than allowed for an Ollama slot"""
+
+    def __init__(self, position: int, eta_seconds: float):
+        super().__init__(f"generation queue full (position {position}, ~{eta_seconds:.0f}s wait)")
+        self.position = position
+        self.eta_seconds = eta_seconds
+
+
+class GenerationTicket:
+    """One admitted generation: ``await wait()`` for a slot, always ``release()`` afterwards"""
+
+    def __init__(self, scheduler: "GenerationScheduler", future: Optional[asyncio.Future], position: int, eta_seconds: float):
+        self.scheduler = scheduler
+        self.future = future  # None when a slot was free right away
+        self.position = position
+        self.eta_seconds = eta_seconds
+        self.started: Optional[float] = time.monotonic() if future is None else None
+        self.released = False
+
+    async def wait(self):
+        """Wait for a slot, giving up (GenerationQueueFull) after the scheduler's max wait"""
+        if self.future is None:
+            return
+        try:
+            await asyncio.wait_for(self.future, self.scheduler.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.scheduler.rejected += 1
+            raise GenerationQueueFull(self.position, self.eta_seconds)
+        self.started = time.monotonic()
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self.scheduler._release(self)
+
+    @property
+    def has_slot(self) -> bool:
+        return self.future is None or (self.future.done() and not self.future.cancelled())
+
+
+class GenerationScheduler:
+    """Admission control in front of the Ollama client.
+
+    At most ``max_concurrency`` generations run at once; the rest wait in FIFO order.
+    A request is rejected immediately (so the caller can fall back to the examples)
+    when the queue already holds ``max_queue`` waiters or when its estimated wait,
+    based on a moving average of recent generation times, exceeds ``max_wait_seconds``.
+    """
+
+    def __init__(self, max_concurrency: int = 1, max_queue: int = 8, max_wait_seconds: float = 15.0,
+                 initial_estimate_seconds: float = 10.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.average_seconds = initial_estimate_seconds
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.completed = 0
+        self.rejected = 0
+
+    def estimate_wait(self, position: int) -> float:
+        """Expected seconds until the ``position``-th waiter (1-based) gets a slot"""
+        if position <= 0:
+            return 0.0
+        return -(-position // self.max_concurrency) * self.average_seconds
+
+    def enter(self) -> GenerationTicket:
+        """Admit a generation or raise GenerationQueueFull"""
+        if self.active < self.max_concurrency and not self.waiters:
+            self.active += 1
+            return GenerationTicket(self, None, 0, 0.0)
+
+        position = len(self.waiters) + 1
+        eta = self.estimate_wait(position)
+        if position > self.max_queue or eta > self.max_wait_seconds:
+            self.rejected += 1
+            raise GenerationQueueFull(position, eta)
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        return GenerationTicket(self, future, position, eta)
+
+    def _release(self, ticket: GenerationTicket):
+        if not ticket.has_slot:
+            # Gave up while waiting (e.g. the client disconnected)
+            if ticket.future in self.waiters:
+                self.waiters.remove(ticket.future)
+            if not ticket.future.done():
+                ticket.future.cancel()
+            return
+
+        if ticket.started is not None:
+            duration = time.monotonic() - ticket.started
+            self.average_seconds = 0.8 * self.average_seconds + 0.2 * duration
+            self.completed += 1
+
+        # Hand the slot straight to the next waiter, if any
+        while self.waiters:
+            future = self.waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def status(self) -> Dict:
+        waiting = len(self.waiters)
+        busy = self.active >= self.max_concurrency
+        return {
+            "active": self.active,
+            "waiting": waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_wait_seconds": self.max_wait_seconds,
+            "average_generation_seconds": round(self.average_seconds, 2),
+            "estimated_wait_seconds": round(self.estimate_wait(waiting + 1) if busy else 0.0, 2),
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
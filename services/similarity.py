@@ -0,0 +1,98 @@
+import hashlib
+import random
+from typing import Dict, Hashable, Iterable, List, Set
+
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def _stable_hash(shingle: str) -> int:
+    """32-bit hash that is the same in every process (unlike hash()), so signatures can be persisted"""
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "big")
+
+
+class MinHasher:
+    """MinHash signatures over sets of shingles (here: normalized code lines).
+
+    The fraction of equal positions in two signatures estimates the Jaccard
+    similarity of the underlying sets.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1337):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                             for _ in range(num_perm)]
+
+    def signature(self, shingles: Iterable[str]) -> List[int]:
+        hashes = [_stable_hash(shingle) for shingle in shingles]
+        if not hashes:
+            return [_MERSENNE_PRIME] * self.num_perm
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self.permutations]
+
+    @staticmethod
+    def estimate(signature1: List[int], signature2: List[int]) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        if not signature1 or len(signature1) != len(signature2):
+            return 0.0
+        return sum(1 for x, y in zip(signature1, signature2) if x == y) / len(signature1)
+
+
+class LSHIndex:
+    """Banded locality-sensitive hashing over MinHash signatures.
+
+    Signatures are cut into ``bands`` bands of ``rows`` values; two items become
+    candidates when any band matches exactly. With 32 bands of 2 rows, pairs at
+    0.6 similarity collide with near certainty, while unrelated code rarely does.
+    """
+
+    def __init__(self, bands: int = 32, rows: int = 2):
+        self.bands = bands
+        self.rows = rows
+        self.buckets: Dict[tuple, Set[Hashable]] = {}
+        self.signatures: Dict[Hashable, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _band_keys(self, signature: List[int]) -> List[tuple]:
+        return [(band, tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+    def add(self, key: Hashable, signature: List[int]):
+        if key in self.signatures:
+            self.remove(key)
+        self.signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self.buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            bucket = self.buckets.get(band_key)
+            if bucket is None:
+                continue
+            bucket.discard(key)
+            if not bucket:
+                del self.buckets[band_key]
+
+    def clear(self):
+        self.buckets = {}
+        self.signatures = {}
+
+    def query(self, signature: List[int]) -> Set[Hashable]:
+        """Keys sharing at least one band with the signature"""
+        found: Set[Hashable] = set()
+        for band_key in self._band_keys(signature):
+            found.update(self.buckets.get(band_key, ()))
+        return found
+
+    def near_duplicates(self, signature: List[int], threshold: float) -> List[tuple]:
+        """(key, estimated similarity) for candidates at or above the threshold, most similar first"""
+        matches = []
+        for key in self.query(signature):
+            similarity = MinHasher.estimate(signature, self.signatures[key])
+            if similarity >= threshold:
+                matches.append((key, similarity))
+        matches.sort(key=lambda item: (-item[1], item[0]))
+        return matches
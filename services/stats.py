@@ -0,0 +1,121 @@
+import threading
+from collections import Counter, deque
+from typing import Deque, Dict, Iterable, List
+
+
+class LearningStats:
+    """Live counters behind ``/learning/stats``.
+
+    Counts are rebuilt from storage once at startup and then updated by the service
+    as examples, feedback and Ollama learning entries are written, so reading them
+    never touches the disk. The Ollama learning context only keeps its newest
+    ``context_window`` entries, so its counters follow that window: the type of each
+    entry is remembered and subtracted again when the entry falls out of it.
+    """
+
+    CONTEXT_TYPES = {
+        "positive_feedback": "positive_feedback",
+        "correction_training": "corrections",
+        "negative_feedback": "negative_feedback",
+    }
+
+    def __init__(self, context_window: int = 100):
+        self.lock = threading.Lock()
+        self.user_corrections = 0
+        self.feedback = Counter()
+        self.context_types: Deque[str] = deque(maxlen=context_window)
+        self.context_counts = Counter()
+
+    def rebuild(self, examples: Iterable[Dict], feedback: Iterable[Dict], context: Iterable[Dict]):
+        """Recount everything from stored data"""
+        with self.lock:
+            self.user_corrections = 0
+            self.feedback = Counter()
+            self.context_types.clear()
+            self.context_counts = Counter()
+        for example in examples:
+            self.record_example(example)
+        for entry in feedback:
+            self.record_feedback(entry)
+        for entry in context:
+            self.record_context(entry)
+
+    def record_example(self, example: Dict):
+        if example.get("source") == "user_correction":
+            with self.lock:
+                self.user_corrections += 1
+
+    def record_feedback(self, entry: Dict):
+        with self.lock:
+            self.feedback["total_feedback"] += 1
+            if entry.get("feedback_type") == "correct":
+                self.feedback["positive"] += 1
+            elif entry.get("feedback_type") == "incorrect":
+                self.feedback["negative"] += 1
+            if entry.get("corrected_code"):
+                self.feedback["corrections"] += 1
+
+    def record_context(self, entry: Dict):
+        entry_type = entry.get("type", "")
+        with self.lock:
+            if len(self.context_types) == self.context_types.maxlen:
+                self.context_counts[self.context_types[0]] -= 1
+            self.context_types.append(entry_type)
+            self.context_counts[entry_type] += 1
+
+    def ollama_counts(self) -> Dict[str, int]:
+        with self.lock:
+            counts = {"learning_examples": len(self.context_types)}
+            for entry_type, name in self.CONTEXT_TYPES.items():
+                counts[name] = self.context_counts[entry_type]
+            return counts
+
+    def feedback_counts(self) -> Dict[str, int]:
+        with self.lock:
+            return {name: self.feedback[name] for name in ("total_feedback", "positive", "negative", "corrections")}
+
+
+class RecentActivity:
+    """Fixed-size ring buffers of the newest feedback, Ollama learning entries and
+    user corrections, behind ``/learning/context``.
+
+    Filled from the tails of storage at startup and appended to on every write.
+    """
+
+    def __init__(self, size: int = 5):
+        self.lock = threading.Lock()
+        self.feedback: Deque[Dict] = deque(maxlen=size)
+        self.ollama_learning: Deque[Dict] = deque(maxlen=size)
+        self.corrections: Deque[Dict] = deque(maxlen=size)
+
+    @property
+    def size(self) -> int:
+        return self.feedback.maxlen
+
+    def rehydrate(self, feedback: Iterable[Dict], ollama_learning: Iterable[Dict], corrections: Iterable[Dict]):
+        with self.lock:
+            for buffer, entries in ((self.feedback, feedback), (self.ollama_learning, ollama_learning),
+                                    (self.corrections, corrections)):
+                buffer.clear()
+                buffer.extend(entries)
+
+    def record_example(self, example: Dict):
+        if example.get("source") == "user_correction":
+            with self.lock:
+                self.corrections.append(example)
+
+    def record_feedback(self, entry: Dict):
+        with self.lock:
+            self.feedback.append(entry)
+
+    def record_context(self, entry: Dict):
+        with self.lock:
+            self.ollama_learning.append(entry)
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        with self.lock:
+            return {
+                "recent_ollama_learning": list(self.ollama_learning),
+                "recent_feedback": list(self.feedback),
+                "recent_corrections": list(self.corrections)
+            }
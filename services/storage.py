@@ -0,0 +1,686 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+
+class ExampleLog:
+    """Append-only storage for learned examples.
+
+    The examples live in a JSON snapshot (``training_data.json``, same format as
+    before) plus a JSONL log of mutations made since that snapshot was written:
+
+        {"op": "add", "id": 24, "example": {...}}
+        {"op": "update", "id": 3, "fields": {"usage_count": 7}}
+
+    Ids are positions in the example list. Loading replays the log on top of the
+    snapshot; every ``compact_every`` log entries the current list is written back
+    as a fresh snapshot and the log is truncated. Replay is idempotent (adds already
+    in the snapshot are skipped, updates carry absolute values), so a crash between
+    writing the snapshot and truncating the log loses nothing and duplicates nothing.
+    """
+
+    def __init__(self, snapshot_path: str, log_path: Optional[str] = None, compact_every: int = 200):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path or os.path.splitext(snapshot_path)[0] + ".log.jsonl"
+        self.compact_every = compact_every
+        self.pending_entries = 0
+        self.lock = threading.RLock()  # usage counters are flushed from a background thread
+
+    def exists(self) -> bool:
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.log_path)
+
+    def load(self) -> List[Dict]:
+        """Snapshot examples with the mutation log replayed on top"""
+        examples: List[Dict] = []
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                examples = json.load(f)
+
+        self.pending_entries = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash mid-append can leave a torn last line; everything before it is intact
+                        print(f"Skipping unreadable entry in {self.log_path}")
+                        continue
+                    self._apply(examples, entry)
+                    self.pending_entries += 1
+        return examples
+
+    def _apply(self, examples: List[Dict], entry: Dict):
+        if entry.get("op") == "add":
+            if entry.get("id", len(examples)) == len(examples):
+                examples.append(entry["example"])
+        elif entry.get("op") == "update" and 0 <= entry.get("id", -1) < len(examples):
+            examples[entry["id"]].update(entry.get("fields", {}))
+
+    def _append(self, *entries: Dict):
+        with self.lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+            self.pending_entries += len(entries)
+
+    def append(self, example_id: int, example: Dict):
+        """Record a newly learned example"""
+        self._append({"op": "add", "id": example_id, "example": example})
+
+    def update(self, example_id: int, fields: Dict):
+        """Record changed fields of an existing example"""
+        self._append({"op": "update", "id": example_id, "fields": fields})
+
+    def update_many(self, updates: Dict[int, Dict]):
+        """Record changed fields of several examples with a single write"""
+        if updates:
+            self._append(*({"op": "update", "id": example_id, "fields": fields}
+                           for example_id, fields in sorted(updates.items())))
+
+    def needs_compaction(self) -> bool:
+        return self.pending_entries >= self.compact_every
+
+    def compact(self, examples: List[Dict]):
+        """Write the full example list as the new snapshot and start an empty log"""
+        with self.lock:
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(examples, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self.pending_entries = 0
+
+
+class WriteBehindCounter:
+    """Collects usage counter increments per example and flushes them in the background.
+
+    ``mark`` only records the increment, so the request path never waits for disk. A
+    daemon thread calls ``flush_fn`` with the pending increments (example id -> amount)
+    every ``flush_interval`` seconds, or sooner once ``max_pending`` examples are
+    waiting. Call ``flush`` on shutdown.
+    """
+
+    def __init__(self, flush_fn: Callable[[Dict[int, int]], None], flush_interval: float = 30.0, max_pending: int = 50):
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: Dict[int, int] = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def mark(self, example_id: int, amount: int = 1):
+        with self.lock:
+            self.pending[example_id] = self.pending.get(example_id, 0) + amount
+            pending_count = len(self.pending)
+            self._ensure_thread()
+        if pending_count >= self.max_pending:
+            self.wake.set()
+
+    def pending_amount(self, example_id: int) -> int:
+        """Increment marked for the example but not flushed yet"""
+        with self.lock:
+            return self.pending.get(example_id, 0)
+
+    def flush(self):
+        """Write out everything pending now (safe to call from any thread)"""
+        with self.lock:
+            increments, self.pending = self.pending, {}
+        if not increments:
+            return
+        try:
+            self.flush_fn(increments)
+        except Exception as e:
+            print(f"Error flushing usage counters: {e}")
+            with self.lock:
+                for example_id, amount in increments.items():
+                    self.pending[example_id] = self.pending.get(example_id, 0) + amount
+
+    def _ensure_thread(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._run, name="usage-counter-flush", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+
+class RecordJournal:
+    """Append-only storage for a record collection that only ever grows (feedback history).
+
+    Records live in a JSON snapshot (the collection's original ``.json`` file) plus a
+    JSONL journal of records added since, so adding a record is one appended line no
+    matter how long the history is. The newest ``tail_size`` records and the total
+    count are kept in memory, so recent-history reads never touch the disk.
+
+    The history is read once, on first use. Consecutive identical records (older
+    versions saved every feedback entry twice) are dropped then, and the journal is
+    folded into the snapshot every ``compact_every`` appends.
+    """
+
+    def __init__(self, snapshot_path: str, log_path: Optional[str] = None,
+                 tail_size: int = 100, compact_every: int = 500):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path or os.path.splitext(snapshot_path)[0] + ".log.jsonl"
+        self.tail: Deque[Dict] = deque(maxlen=tail_size)
+        self.count = 0
+        self.compact_every = compact_every
+        self.pending_entries = 0
+        self.loaded = False
+        self.lock = threading.RLock()
+
+    def _read(self) -> List[Dict]:
+        records: List[Dict] = []
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                try:
+                    records = json.load(f)
+                except json.JSONDecodeError as e:
+                    print(f"Ignoring unreadable {self.snapshot_path}: {e}")
+
+        self.pending_entries = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        print(f"Skipping unreadable entry in {self.log_path}")
+                        continue
+                    self.pending_entries += 1
+        return records
+
+    def _ensure_loaded(self):
+        if self.loaded:
+            return
+        records = self._read()
+        deduped = [record for i, record in enumerate(records) if i == 0 or record != records[i - 1]]
+        if len(deduped) != len(records):
+            print(f"🧹 Dropped {len(records) - len(deduped)} duplicated records from {self.snapshot_path}")
+            self._compact(deduped)
+        self.count = len(deduped)
+        self.tail.extend(deduped[-self.tail.maxlen:])
+        self.loaded = True
+
+    def __len__(self) -> int:
+        with self.lock:
+            self._ensure_loaded()
+            return self.count
+
+    def records(self) -> List[Dict]:
+        """Full history, oldest first (reads the files)"""
+        with self.lock:
+            self._ensure_loaded()
+            records = self._read()
+            return [record for i, record in enumerate(records) if i == 0 or record != records[i - 1]]
+
+    def recent(self, limit: int) -> List[Dict]:
+        """Newest records from memory, oldest first (``limit`` up to the tail size)"""
+        with self.lock:
+            self._ensure_loaded()
+            return list(self.tail)[-limit:]
+
+    def append(self, record: Dict):
+        with self.lock:
+            self._ensure_loaded()
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.tail.append(record)
+            self.count += 1
+            self.pending_entries += 1
+            if self.pending_entries >= self.compact_every:
+                self._compact(self.records())
+
+    def replace(self, position: int, record: Dict):
+        with self.lock:
+            records = self.records()
+            records[position] = record
+            self._compact(records)
+            self.tail.clear()
+            self.tail.extend(records[-self.tail.maxlen:])
+
+    def _compact(self, records: List[Dict]):
+        """Write the records as the new snapshot and start an empty journal"""
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.snapshot_path)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self.pending_entries = 0
+
+
+# Record collections and the JSON files they are kept in by the file backend
+RECORD_FILES = {
+    "feedback": "feedback_data.json",
+    "error_patterns": "error_patterns.json",
+    "negative_examples": "negative_examples.json",
+    "ollama_feedback": "ollama_feedback.json",
+    "ollama_learning_context": "ollama_learning_context.json",
+    "ollama_learning_summary": "ollama_learning_summary.json",
+    "codellama_feedback": "codellama_feedback.json",
+}
+
+# Collections that only grow; the file backend keeps them in a RecordJournal
+JOURNALED_COLLECTIONS = ("feedback",)
+
+
+def _record_prompt(record: Dict) -> Optional[str]:
+    return record.get("prompt") or record.get("prompt_pattern")
+
+
+class StorageBackend(ABC):
+    """Where the service keeps learned examples and its record collections.
+
+    Examples are addressed by their position in the service's example list. Every
+    other collection (see ``RECORD_FILES``) is an ordered list of JSON records that
+    is appended to, optionally trimmed to its newest ``keep`` entries, and read back
+    oldest first.
+    """
+
+    pending_entries = 0  # example mutations not yet folded into a snapshot
+    shared = False  # whether other processes write to the same storage
+
+    @abstractmethod
+    def examples_exist(self) -> bool:
+        pass
+
+    @abstractmethod
+    def load_examples(self) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    def append_example(self, example_id: int, example: Dict):
+        pass
+
+    def load_new_examples(self) -> List[Dict]:
+        """Examples other processes added since this one loaded or last asked, in order"""
+        return []
+
+    @abstractmethod
+    def add_usage_counts(self, increments: Dict[int, int], examples: List[Dict]) -> Dict[int, int]:
+        """Add ``increments`` (example id -> uses) to the stored usage counts.
+
+        ``examples`` is the caller's list, which already counts the increments. Returns
+        the stored totals of backends other processes write to as well (else empty).
+        """
+
+    @abstractmethod
+    def save_examples(self, examples: List[Dict]):
+        """Write the full example list"""
+
+    @abstractmethod
+    def seed_examples(self, examples: List[Dict]) -> List[Dict]:
+        """Store ``examples`` as the first ones, unless another process already stored
+        examples; returns the examples now in storage"""
+
+    def needs_compaction(self) -> bool:
+        return False
+
+    @abstractmethod
+    def load_records(self, collection: str, limit: Optional[int] = None, prompt: Optional[str] = None) -> List[Dict]:
+        """Records of a collection, oldest first; ``limit`` keeps only the newest ones"""
+
+    def count_records(self, collection: str) -> int:
+        return len(self.load_records(collection))
+
+    @abstractmethod
+    def append_record(self, collection: str, record: Dict, keep: Optional[int] = None):
+        """Add a record, then drop all but the newest ``keep`` records of the collection"""
+
+    @abstractmethod
+    def update_record(self, collection: str, prompt: str, match: Callable[[Dict], bool],
+                      update: Callable[[Dict], None]) -> Optional[Dict]:
+        """Apply ``update`` to the first record for ``prompt`` accepted by ``match``, in one
+        step; returns the updated record, or None if no record matched"""
+
+    def close(self):
+        pass
+
+
+class JsonStorage(StorageBackend):
+    """File backend: examples in ``ExampleLog``, each collection in its own JSON file
+    (growing collections in a ``RecordJournal`` on top of that file)"""
+
+    def __init__(self, training_path: str, record_files: Optional[Dict[str, str]] = None):
+        self.example_log = ExampleLog(training_path)
+        self.record_files = dict(record_files or RECORD_FILES)
+        self.journals = {collection: RecordJournal(self.record_files[collection])
+                         for collection in JOURNALED_COLLECTIONS if collection in self.record_files}
+        self.lock = threading.RLock()
+
+    @property
+    def pending_entries(self) -> int:
+        return self.example_log.pending_entries
+
+    def examples_exist(self) -> bool:
+        return self.example_log.exists()
+
+    def load_examples(self) -> List[Dict]:
+        return self.example_log.load()
+
+    def append_example(self, example_id: int, example: Dict):
+        self.example_log.append(example_id, example)
+
+    def add_usage_counts(self, increments: Dict[int, int], examples: List[Dict]) -> Dict[int, int]:
+        # Only this process writes the files, so its counts are the stored ones
+        self.example_log.update_many({example_id: {"usage_count": examples[example_id].get("usage_count", 0)}
+                                      for example_id in increments})
+        return {}
+
+    def save_examples(self, examples: List[Dict]):
+        self.example_log.compact(examples)
+
+    def seed_examples(self, examples: List[Dict]) -> List[Dict]:
+        # Only this process writes the files
+        self.example_log.compact(examples)
+        return examples
+
+    def needs_compaction(self) -> bool:
+        return self.example_log.needs_compaction()
+
+    def _read(self, collection: str) -> List[Dict]:
+        path = self.record_files[collection]
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError as e:
+                print(f"Ignoring unreadable {path}: {e}")
+                return []
+
+    def _write(self, collection: str, records: List[Dict]):
+        path = self.record_files[collection]
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load_records(self, collection: str, limit: Optional[int] = None, prompt: Optional[str] = None) -> List[Dict]:
+        journal = self.journals.get(collection)
+        if journal is not None:
+            if limit and prompt is None and limit <= journal.tail.maxlen:
+                return journal.recent(limit)
+            records = journal.records()
+        else:
+            records = self._read(collection)
+        if prompt is not None:
+            records = [record for record in records if _record_prompt(record) == prompt]
+        return records[-limit:] if limit else records
+
+    def count_records(self, collection: str) -> int:
+        journal = self.journals.get(collection)
+        if journal is not None:
+            return len(journal)
+        return len(self._read(collection))
+
+    def append_record(self, collection: str, record: Dict, keep: Optional[int] = None):
+        if collection in self.journals:
+            self.journals[collection].append(record)
+            return
+        with self.lock:
+            records = self._read(collection)
+            records.append(record)
+            self._write(collection, records[-keep:] if keep else records)
+
+    def update_record(self, collection: str, prompt: str, match: Callable[[Dict], bool],
+                      update: Callable[[Dict], None]) -> Optional[Dict]:
+        with self.lock:
+            journal = self.journals.get(collection)
+            records = journal.records() if journal is not None else self._read(collection)
+            for position, record in enumerate(records):
+                if _record_prompt(record) == prompt and match(record):
+                    update(record)
+                    if journal is not None:
+                        journal.replace(position, record)
+                    else:
+                        self._write(collection, records)
+                    return record
+        return None
+
+
+class SQLiteStorage(StorageBackend):
+    """SQLite backend (WAL mode) holding examples and every record collection in indexed tables.
+
+    Writes touch single rows, so they cost the same however much history there is,
+    and several worker processes can share one database file. Examples keep their
+    list position in the service; this backend maps positions to row ids, so rows
+    added by other workers never shift the ids this process writes to, and
+    ``load_new_examples`` picks those rows up. Usage counts live in their own column
+    and are only ever incremented, so workers never overwrite each other's counts.
+    """
+
+    shared = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS examples (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt TEXT,
+            usage_count INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_examples_prompt ON examples (prompt);
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            collection TEXT NOT NULL,
+            prompt TEXT,
+            timestamp TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_records_collection ON records (collection, id);
+        CREATE INDEX IF NOT EXISTS idx_records_prompt ON records (collection, prompt);
+    """
+
+    def __init__(self, path: str, import_from: Optional[JsonStorage] = None):
+        self.path = path
+        self.lock = threading.RLock()
+        self.row_ids: List[int] = []  # example position -> row id
+        self.synced_row_id = 0  # newest row id seen in a load, rows after it may be new
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._migrate()
+        if import_from is not None:
+            self.import_json(import_from)
+
+    def _migrate(self):
+        """Give databases created before the usage_count column one, filled from the stored examples"""
+        with self.lock:
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(examples)")]
+            if "usage_count" in columns:
+                return
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                # Another worker may have migrated while this one waited for the write lock
+                if "usage_count" in [row[1] for row in self.conn.execute("PRAGMA table_info(examples)")]:
+                    return
+                self.conn.execute("ALTER TABLE examples ADD COLUMN usage_count INTEGER NOT NULL DEFAULT 0")
+                rows = self.conn.execute("SELECT id, data FROM examples").fetchall()
+                self.conn.executemany("UPDATE examples SET usage_count = ? WHERE id = ?",
+                                      [(json.loads(data).get("usage_count", 0), row_id) for row_id, data in rows])
+
+    def _example_row(self, example: Dict) -> tuple:
+        return (example.get("prompt"), example.get("usage_count", 0), json.dumps(example, ensure_ascii=False))
+
+    def import_json(self, source: JsonStorage):
+        """Copy examples and collections from the JSON files into tables that are still empty.
+
+        Workers starting together may all try this: each check is repeated under the
+        write lock, in the transaction that inserts, so only the first one imports.
+        """
+        with self.lock:
+            if not self.examples_exist() and source.examples_exist():
+                examples = source.load_examples()
+                with self.conn:
+                    self.conn.execute("BEGIN IMMEDIATE")
+                    imported = not self.examples_exist()
+                    if imported:
+                        self.conn.executemany("INSERT INTO examples (prompt, usage_count, data) VALUES (?, ?, ?)",
+                                              [self._example_row(example) for example in examples])
+                if imported:
+                    print(f"📦 Imported {len(examples)} examples into {self.path}")
+
+            for collection in source.record_files:
+                if self.count_records(collection):
+                    continue
+                records = source.load_records(collection)
+                if not records:
+                    continue
+                with self.conn:
+                    self.conn.execute("BEGIN IMMEDIATE")
+                    imported = not self.count_records(collection)
+                    if imported:
+                        self.conn.executemany(
+                            "INSERT INTO records (collection, prompt, timestamp, data) VALUES (?, ?, ?, ?)",
+                            [self._record_row(collection, record) for record in records]
+                        )
+                if imported:
+                    print(f"📦 Imported {len(records)} {collection} records into {self.path}")
+
+    def _record_row(self, collection: str, record: Dict) -> tuple:
+        return (collection, _record_prompt(record), record.get("timestamp"), json.dumps(record, ensure_ascii=False))
+
+    def examples_exist(self) -> bool:
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM examples LIMIT 1").fetchone() is not None
+
+    def _rows_to_examples(self, rows: List[tuple]) -> List[Dict]:
+        examples = []
+        for _, usage_count, data in rows:
+            example = json.loads(data)
+            example["usage_count"] = usage_count  # the column is authoritative, the JSON copy may be stale
+            examples.append(example)
+        return examples
+
+    def load_examples(self) -> List[Dict]:
+        with self.lock:
+            rows = self.conn.execute("SELECT id, usage_count, data FROM examples ORDER BY id").fetchall()
+            self.row_ids = [row[0] for row in rows]
+            self.synced_row_id = self.row_ids[-1] if rows else 0
+        return self._rows_to_examples(rows)
+
+    def load_new_examples(self) -> List[Dict]:
+        with self.lock:
+            rows = self.conn.execute("SELECT id, usage_count, data FROM examples WHERE id > ? ORDER BY id",
+                                     (self.synced_row_id,)).fetchall()
+            if not rows:
+                return []
+            self.synced_row_id = rows[-1][0]
+            known = set(self.row_ids)
+            rows = [row for row in rows if row[0] not in known]  # skip the ones this process added
+            self.row_ids.extend(row[0] for row in rows)
+        return self._rows_to_examples(rows)
+
+    def append_example(self, example_id: int, example: Dict):
+        with self.lock, self.conn:
+            cursor = self.conn.execute("INSERT INTO examples (prompt, usage_count, data) VALUES (?, ?, ?)",
+                                       self._example_row(example))
+            self.row_ids.append(cursor.lastrowid)
+
+    def add_usage_counts(self, increments: Dict[int, int], examples: List[Dict]) -> Dict[int, int]:
+        with self.lock, self.conn:
+            row_positions = {self.row_ids[example_id]: example_id for example_id in increments}
+            self.conn.executemany("UPDATE examples SET usage_count = usage_count + ? WHERE id = ?",
+                                  [(amount, self.row_ids[example_id]) for example_id, amount in sorted(increments.items())])
+            placeholders = ",".join("?" * len(row_positions))
+            rows = self.conn.execute(f"SELECT id, usage_count FROM examples WHERE id IN ({placeholders})",
+                                     list(row_positions)).fetchall()
+        return {row_positions[row_id]: usage_count for row_id, usage_count in rows}
+
+    def save_examples(self, examples: List[Dict]):
+        # Existing rows keep their usage_count column; other workers may have added to it
+        with self.lock, self.conn:
+            for example_id, example in enumerate(examples):
+                if example_id < len(self.row_ids):
+                    self.conn.execute("UPDATE examples SET prompt = ?, data = ? WHERE id = ?",
+                                      (example.get("prompt"), json.dumps(example, ensure_ascii=False),
+                                       self.row_ids[example_id]))
+                else:
+                    cursor = self.conn.execute("INSERT INTO examples (prompt, usage_count, data) VALUES (?, ?, ?)",
+                                               self._example_row(example))
+                    self.row_ids.append(cursor.lastrowid)
+
+    def seed_examples(self, examples: List[Dict]) -> List[Dict]:
+        with self.lock:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                if not self.examples_exist():
+                    self.conn.executemany("INSERT INTO examples (prompt, usage_count, data) VALUES (?, ?, ?)",
+                                          [self._example_row(example) for example in examples])
+            return self.load_examples()
+
+    def load_records(self, collection: str, limit: Optional[int] = None, prompt: Optional[str] = None) -> List[Dict]:
+        query = "SELECT id, data FROM records WHERE collection = ?"
+        params: list = [collection]
+        if prompt is not None:
+            query += " AND prompt = ?"
+            params.append(prompt)
+        query += " ORDER BY id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [json.loads(data) for _, data in reversed(rows)]
+
+    def count_records(self, collection: str) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM records WHERE collection = ?", (collection,)).fetchone()[0]
+
+    def append_record(self, collection: str, record: Dict, keep: Optional[int] = None):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT INTO records (collection, prompt, timestamp, data) VALUES (?, ?, ?, ?)",
+                              self._record_row(collection, record))
+            if keep:
+                self.conn.execute(
+                    "DELETE FROM records WHERE collection = ? AND id <= "
+                    "(SELECT id FROM records WHERE collection = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (collection, collection, keep)
+                )
+
+    def update_record(self, collection: str, prompt: str, match: Callable[[Dict], bool],
+                      update: Callable[[Dict], None]) -> Optional[Dict]:
+        with self.lock, self.conn:
+            # Take the write lock before reading, so no other worker changes the row in between
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute("SELECT id, data FROM records WHERE collection = ? AND prompt = ? ORDER BY id",
+                                     (collection, prompt)).fetchall()
+            for row_id, data in rows:
+                record = json.loads(data)
+                if match(record):
+                    update(record)
+                    self.conn.execute("UPDATE records SET prompt = ?, timestamp = ?, data = ? WHERE id = ?",
+                                      (_record_prompt(record), record.get("timestamp"),
+                                       json.dumps(record, ensure_ascii=False), row_id))
+                    return record
+        return None
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def open_storage(kind: str, training_path: str, sqlite_path: str = "skducky.db") -> StorageBackend:
+    """Storage backend by name: "json" (default, one file per collection) or "sqlite" """
+    json_storage = JsonStorage(training_path)
+    if kind == "sqlite":
+        return SQLiteStorage(sqlite_path, import_from=json_storage)
+    return json_storage
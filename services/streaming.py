@@ -0,0 +1,47 @@
+from typing import Callable
+
+
+class IncrementalCodeCleaner:
+    """Runs a whole-text cleaning function (``_clean_ollama_generated_code``) over streamed text.
+
+    Text is cleaned again each time a line completes, and only output that can no
+    longer change is released, so the concatenated deltas always equal a prefix of
+    cleaning the full text. ``finish`` returns the rest once the stream has ended;
+    ``code`` then holds the same result as cleaning the whole response at once.
+    """
+
+    def __init__(self, clean_fn: Callable[[str], str]):
+        self.clean_fn = clean_fn
+        self.raw = ""
+        self.code = ""
+        self.lines_seen = 0
+
+    def feed(self, text: str) -> str:
+        """Add streamed text; returns newly stable cleaned code (possibly empty)"""
+        self.raw += text
+        complete = self.raw[:self.raw.rfind("\n") + 1]
+        lines = complete.count("\n")
+        if lines == self.lines_seen:
+            return ""
+        self.lines_seen = lines
+
+        # A leading ``` fence is only dropped once a third line shows it is not the whole response
+        if self.raw.lstrip().startswith("```") and len(complete.strip().split("\n")) < 3:
+            return ""
+        return self._advance(self.clean_fn(complete))
+
+    def finish(self) -> str:
+        """Clean the complete response; returns whatever was not released yet"""
+        final = self.clean_fn(self.raw)
+        if not final.startswith(self.code):
+            # Should not happen for prefix-stable cleaning; the caller sends ``code`` as the final result anyway
+            self.code = final
+            return ""
+        return self._advance(final)
+
+    def _advance(self, cleaned: str) -> str:
+        if not cleaned.startswith(self.code):
+            return ""
+        delta = cleaned[len(self.code):]
+        self.code = cleaned
+        return delta
@@ -1,3 +1,5 @@
+import asyncio
+
 from .ai_service import SkDuckyAIService
 from .ai_service import AIRequest
 
@@ -6,7 +8,7 @@ ai = SkDuckyAIService()
 ai.learn("give 1 diamond on join", "on join:\n    give 1 diamond to player")
 
 request = AIRequest(prompt="when a player joins, he gets a diamond")
-response = ai.generate_code(request)
+response = asyncio.run(ai.generate_code(request))
 
 print("Answer:")
 print(response.code)
@@ -0,0 +1,86 @@
+import re
+import time
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+DURATION_UNITS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+
+
+def parse_keep_alive(value: str) -> Union[int, str]:
+    """Ollama ``keep_alive`` value from configuration: plain numbers are seconds (negative
+    keeps the model loaded forever), anything else is a duration string such as ``30m``"""
+    value = value.strip()
+    return int(value) if re.fullmatch(r"-?\d+", value) else value
+
+
+def keep_alive_seconds(keep_alive: Union[int, str]) -> Optional[float]:
+    """How long Ollama keeps an idle model loaded; None means forever"""
+    if isinstance(keep_alive, int):
+        return None if keep_alive < 0 else float(keep_alive)
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", keep_alive)
+    if not parts or keep_alive.startswith("-"):
+        return None if keep_alive.startswith("-") else 300.0  # Ollama's default is 5 minutes
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class ModelWarmth:
+    """Tracks which Ollama models are loaded in memory, as far as this service can tell.
+
+    A model is warm after a warm-up request or a generation succeeded, until it has
+    been idle for longer than the keep-alive. Ollama reports ``load_duration`` with
+    every response, so the time the last cold load took is recorded too.
+    """
+
+    def __init__(self, keep_alive: Union[int, str] = "30m"):
+        self.keep_alive = keep_alive
+        self.idle_seconds = keep_alive_seconds(keep_alive)
+        self.models: Dict[str, Dict] = {}
+
+    def _entry(self, model: str) -> Dict:
+        return self.models.setdefault(model, {"loading": False, "last_used": None, "load_seconds": None,
+                                              "warmed_at": None, "last_error": None})
+
+    def mark_loading(self, model: str):
+        self._entry(model)["loading"] = True
+
+    def mark_used(self, model: str, load_seconds: Optional[float] = None):
+        """A request to ``model`` succeeded; ``load_seconds`` is Ollama's load_duration for it"""
+        entry = self._entry(model)
+        if entry["loading"] or entry["warmed_at"] is None:
+            entry["warmed_at"] = datetime.now().isoformat()
+        entry["loading"] = False
+        entry["last_used"] = time.monotonic()
+        entry["last_error"] = None
+        if load_seconds is not None and load_seconds >= 0.5:  # anything shorter was already in memory
+            entry["load_seconds"] = round(load_seconds, 2)
+
+    def mark_failed(self, model: str, error: object):
+        entry = self._entry(model)
+        entry["loading"] = False
+        entry["last_error"] = str(error) or error.__class__.__name__
+
+    def state(self, model: str) -> str:
+        entry = self.models.get(model)
+        if entry is None:
+            return "cold"
+        if entry["loading"]:
+            return "loading"
+        if entry["last_used"] is None:
+            return "cold"
+        if self.idle_seconds is not None and time.monotonic() - entry["last_used"] > self.idle_seconds:
+            return "cold"
+        return "warm"
+
+    def is_warm(self, model: str) -> bool:
+        return self.state(model) == "warm"
+
+    def status(self) -> Dict[str, Dict]:
+        return {
+            model: {
+                "state": self.state(model),
+                "load_seconds": entry["load_seconds"],
+                "warmed_at": entry["warmed_at"],
+                "last_error": entry["last_error"]
+            }
+            for model, entry in self.models.items()
+        }
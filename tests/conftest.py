@@ -0,0 +1,26 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """A scratch copy of the JSON data files, as the working directory"""
+    for name in os.listdir(ROOT):
+        if name.endswith(".json"):
+            shutil.copy(os.path.join(ROOT, name), tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def ai(data_dir):
+    from services.ai_service import SkDuckyAIService
+    service = SkDuckyAIService()
+    yield service
+    service.flush_usage_counts()  # while still in data_dir, not at interpreter exit
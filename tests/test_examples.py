@@ -0,0 +1,17 @@
+import json
+
+from services.ai_service import SkDuckyAIService
+
+
+def test_minhash_is_not_persisted_but_rebuilt_on_load(ai, data_dir):
+    code = "on join:\n    give 1 diamond to player\n    send \"welcome\" to player"
+    ai.learn("diamond on join", code)
+    ai.save_examples()
+
+    saved = json.loads((data_dir / "training_data.json").read_text())
+    assert all("minhash" not in example.get("features", {}) for example in saved)
+    assert all("minhash" not in example["features"] for example in ai.examples)
+
+    reloaded = SkDuckyAIService()
+    assert len(reloaded.example_lsh) == len(reloaded.examples)
+    assert "almost the same as 'diamond on join'" in reloaded.learn("welcome diamond", code)
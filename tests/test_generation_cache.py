@@ -0,0 +1,37 @@
+import asyncio
+
+from models import AIRequest
+
+
+def fake_ollama(ai, monkeypatch):
+    calls = []
+
+    async def generate(prompt, examples, include_explanation, session_id=None):
+        calls.append(session_id)
+        ai._remember_session_context(session_id, {"model": ai.ollama_model}, {"context": [len(calls)]})
+        return {"code": f"# answer {len(calls)}", "source": "hybrid_ollama_examples"}
+
+    ai.ollama_enabled = True
+    ai.ollama_deadline = 0
+    monkeypatch.setattr(ai, "generate_with_ollama_hybrid", generate)
+    return calls
+
+
+def generate(ai, prompt, session_id=None):
+    return asyncio.run(ai.generate_code(AIRequest(prompt=prompt, session_id=session_id))).code
+
+
+def test_responses_are_not_shared_across_sessions(ai, monkeypatch):
+    calls = fake_ollama(ai, monkeypatch)
+
+    assert generate(ai, "give diamond on join") == generate(ai, "give diamond on join")
+    assert len(calls) == 1
+
+    first = generate(ai, "give diamond on join", session_id="a")
+    second = generate(ai, "give diamond on join", session_id="b")
+    assert calls == [None, "a", "b"]
+    assert first != second
+
+    # The session has moved on since, so its earlier answer is not reused either
+    generate(ai, "give diamond on join", session_id="a")
+    assert calls == [None, "a", "b", "a"]
@@ -0,0 +1,30 @@
+import asyncio
+
+from services.jobs import JobStore, JobWorkers
+
+
+def test_slow_webhooks_do_not_hold_up_the_workers():
+    async def run():
+        notified = []
+
+        async def handler(payload):
+            return payload * 2
+
+        async def on_finished(job, payload):
+            await asyncio.sleep(10 if payload == 1 else 0)
+            notified.append(payload)
+
+        store = JobStore()
+        workers = JobWorkers(store, handler, workers=1, on_finished=on_finished, notify_timeout=0.2)
+        first, second = workers.submit("test", 1), workers.submit("test", 2)
+
+        await asyncio.sleep(0.05)
+        assert (first.result, second.result) == (2, 4)  # the second job ran while the first webhook hung
+        assert notified == [2]
+
+        await asyncio.sleep(0.3)
+        assert not workers.notifications  # the hung webhook was given up on
+        await workers.stop()
+        return notified
+
+    assert asyncio.run(run()) == [2]
@@ -0,0 +1,36 @@
+import random
+
+ITEMS = ["diamond", "emerald", "gold", "iron", "sword", "apple", "bread", "bow"]
+ACTIONS = ["give", "teleport", "kill", "heal", "broadcast", "send", "ban", "kick"]
+EVENTS = ["join", "death", "respawn", "quit", "chat"]
+
+
+def learn_examples(ai, count=150, seed=7):
+    rng = random.Random(seed)
+    for i in range(count):
+        action, item, event = rng.choice(ACTIONS), rng.choice(ITEMS), rng.choice(EVENTS)
+        prompt = f"{action} {item} on {event} {i}"
+        code = f"on {event}:\n    {action} 1 {item} to player\n    send \"{item} {i}\" to player"
+        ai.learn(prompt, code)
+
+
+def best_match(ai, prompt, mode):
+    ai.vector_scoring = mode
+    concepts = ai._extract_concepts(prompt)
+    if mode == "on":
+        matches = ai._vector_pattern_matches(prompt, concepts)
+    else:
+        matches = ai._loop_pattern_matches(prompt, concepts)
+    if not matches:
+        return None
+    best = max(matches, key=lambda match: match["relevance"])
+    return best["example"]["prompt"], round(best["relevance"], 6)
+
+
+def test_loop_and_vector_pattern_matches_agree(ai):
+    learn_examples(ai)
+    rng = random.Random(11)
+    prompts = ["diamond emerald gold", "give diamond sword", "teleport player to spawn"]
+    prompts += [" ".join(rng.sample(ITEMS + ACTIONS + EVENTS, 3)) for _ in range(200)]
+    for prompt in prompts:
+        assert best_match(ai, prompt, "off") == best_match(ai, prompt, "on"), prompt
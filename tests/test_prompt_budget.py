@@ -0,0 +1,17 @@
+def test_hybrid_prompt_keeps_the_best_ranked_examples(ai):
+    prompt = "give the player a diamond sword when they join"
+    ranked = [{"prompt": f"example {rank}", "code": f"on join:\n    give 1 stone to player # {rank}"} for rank in range(1, 5)]
+    ranked.append({"prompt": prompt, "code": "on join:\n    give 1 diamond sword to player"})  # same words, ranked last
+
+    _, budget = ai._build_hybrid_payload(prompt, ranked)
+
+    assert [piece.label for piece in budget.included] == ["example 1", "example 2", "example 3"]
+
+
+def test_ollama_prompt_keeps_the_best_ranked_examples(ai):
+    prompt = "teleport player to spawn"
+    ranked = [example["prompt"] for example, _ in ai._rank_examples(prompt, 5)]
+
+    _, budget = ai._build_ollama_prompt(prompt)
+
+    assert [piece.label for piece in budget.included if piece.kind == "example"] == ranked[:3]
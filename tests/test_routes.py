@@ -0,0 +1,39 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes.ai
+
+
+def client_for(ai, monkeypatch):
+    monkeypatch.setattr(routes.ai, "ai_service", ai)
+    app = FastAPI()
+    app.include_router(routes.ai.router, prefix="/api/v1/ai")
+    return TestClient(app)
+
+
+def test_ollama_status_reports_circuit_breaker(ai, monkeypatch):
+    client = client_for(ai, monkeypatch)
+    assert client.get("/api/v1/ai/ollama/status").json()["circuit_breaker"]["state"] == "closed"
+
+    ai.ollama_breaker.trip("connection refused")
+    status = client.get("/api/v1/ai/ollama/status").json()
+
+    assert status["circuit_breaker"]["state"] == "open"
+    assert status["circuit_breaker"]["consecutive_failures"] == 1
+    assert status["ollama_available"] is False
+
+
+def test_ollama_status_reports_model_warmth(ai, monkeypatch):
+    client = client_for(ai, monkeypatch)
+    assert client.get("/api/v1/ai/ollama/status").json()["model_state"] == "cold"
+
+    ai.model_warmth.mark_loading(ai.ollama_model)
+    assert client.get("/api/v1/ai/ollama/status").json()["model_state"] == "loading"
+
+    ai.model_warmth.mark_used(ai.ollama_model, load_seconds=2.5)
+    status = client.get("/api/v1/ai/ollama/status").json()
+
+    assert status["model_state"] == "warm"
+    assert status["models"][ai.ollama_model]["state"] == "warm"
+    assert status["models"][ai.ollama_model]["load_seconds"] == 2.5
+    assert status["keep_alive"] == ai.ollama_keep_alive
@@ -0,0 +1,92 @@
+import multiprocessing
+
+import pytest
+
+from services.ai_service import SkDuckyAIService
+from services.storage import JsonStorage, SQLiteStorage
+
+
+def analysis(error_type):
+    return {"error_type": error_type, "specific_issue": "wrong item", "confidence": 0.9}
+
+
+@pytest.fixture
+def sqlite_workers(data_dir, monkeypatch):
+    monkeypatch.setenv("SKDUCKY_STORAGE", "sqlite")
+    monkeypatch.setenv("SKDUCKY_STORAGE_SYNC_SECONDS", "0")
+    workers = [SkDuckyAIService() for _ in range(2)]
+    yield workers
+    for worker in workers:
+        worker.flush_usage_counts()
+
+
+def test_sqlite_usage_counts_add_up_across_workers(data_dir):
+    path = str(data_dir / "shared.db")
+    first, second = SQLiteStorage(path), SQLiteStorage(path)
+    first.append_example(0, {"prompt": "give diamond", "code": "give 1 diamond to player", "usage_count": 0})
+    examples = second.load_examples()
+    first.load_examples()
+
+    assert first.add_usage_counts({0: 5}, examples) == {0: 5}
+    assert second.add_usage_counts({0: 1}, examples) == {0: 6}
+    second.save_examples(examples)
+    assert SQLiteStorage(path).load_examples()[0]["usage_count"] == 6
+
+
+def test_sqlite_error_patterns_are_updated_by_key(sqlite_workers):
+    a, b = sqlite_workers
+    a._create_error_pattern("prompt a", "give 1 dirt to player", analysis("wrong_item"))
+    b._create_error_pattern("prompt b", "give 1 stone to player", analysis("wrong_item"))
+    b._create_error_pattern("prompt b", "give 1 stone to player", analysis("wrong_item"))
+
+    patterns = a.storage.load_records("error_patterns")
+    assert [(p["prompt_pattern"], p["occurrences"]) for p in patterns if p["prompt_pattern"].startswith("prompt")] == \
+        [("prompt a", 1), ("prompt b", 2)]
+
+
+def test_sqlite_workers_see_each_others_examples(sqlite_workers):
+    a, b = sqlite_workers
+    a.learn("strike lightning on chat", "on chat:\n    strike lightning at player")
+    b._sync_storage()
+
+    assert b.examples[-1]["prompt"] == "strike lightning on chat"
+    assert b._rank_all_example_ids("strike lightning")[0][0] == len(b.examples) - 1
+
+
+def open_together(barrier, open_storage):
+    barrier.wait()
+    open_storage()
+
+
+def run_together(open_storage, count=4):
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(count)
+    processes = [context.Process(target=open_together, args=(barrier, open_storage)) for _ in range(count)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+
+
+def test_concurrent_first_start_imports_json_once(data_dir):
+    source = JsonStorage(str(data_dir / "training_data.json"))
+    expected = len(source.load_examples())
+    for attempt in range(5):
+        path = str(data_dir / f"import-{attempt}.db")
+        run_together(lambda: SQLiteStorage(path, import_from=JsonStorage(str(data_dir / "training_data.json"))))
+        storage = SQLiteStorage(path)
+        assert len(storage.load_examples()) == expected
+        assert {collection: storage.count_records(collection) for collection in source.record_files} == \
+            {collection: len(source.load_records(collection)) for collection in source.record_files}
+
+
+def test_concurrent_first_start_seeds_examples_once(data_dir, monkeypatch):
+    (data_dir / "training_data.json").unlink()
+    monkeypatch.setenv("SKDUCKY_STORAGE", "sqlite")
+    for attempt in range(5):
+        path = str(data_dir / f"seed-{attempt}.db")
+        monkeypatch.setenv("SKDUCKY_SQLITE_PATH", path)
+        run_together(SkDuckyAIService)
+        seeded = SQLiteStorage(path).load_examples()
+        assert len(seeded) == len({example["prompt"] for example in seeded}) > 0
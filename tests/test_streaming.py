@@ -0,0 +1,53 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from models import AIRequest
+
+
+def collect(ai, prompt):
+    async def run():
+        return [event async for event in ai.stream_generation(AIRequest(prompt=prompt))]
+    return asyncio.run(run())
+
+
+def test_fallback_done_event_names_its_source(ai):
+    events = collect(ai, "give diamond on join")
+
+    done = events[-1]
+    assert done["type"] == "done"
+    assert done["source"] == "examples"
+    assert done["code"]
+
+
+def mock_ollama(ai, monkeypatch):
+    def handle(request):
+        payload = json.loads(request.content)
+        if payload.get("stream"):
+            lines = [{"response": "on join:\n    give 1 diamond to player\n"}, {"response": "", "done": True}]
+            return httpx.Response(200, text="".join(json.dumps(line) + "\n" for line in lines))
+        return httpx.Response(200, json={"response": "Gives every joining player a diamond.", "done": True})
+
+    client = httpx.AsyncClient(base_url=ai.ollama_client.base_url, transport=httpx.MockTransport(handle))
+    monkeypatch.setattr(ai.ollama_client, "_get_client", lambda: client)
+    ai.ollama_enabled = True
+
+
+def test_stream_explanation_does_not_wait_for_its_own_slot(ai, monkeypatch):
+    mock_ollama(ai, monkeypatch)
+    ai.generation_scheduler.max_wait_seconds = 1.0
+
+    async def run():
+        request = AIRequest(prompt="give diamond on join", include_explanation=True)
+        return [event async for event in ai.stream_generation(request, hybrid=False)]
+
+    started = time.monotonic()
+    done = asyncio.run(run())[-1]
+
+    assert done["source"] == "ollama"
+    assert "diamond" in done["explanation"]
+    assert time.monotonic() - started < 1.0
+    assert ai.generation_scheduler.status()["rejected"] == 0
+    assert ai.generation_scheduler.status()["active"] == 0